@@ -2,12 +2,29 @@
 # visit http://127.0.0.1:8050/ in your web browser.
 
 import dash
+import pandas as pd
 from dash import Dash, dcc, html
 
+from stations import LIVE, PRELOAD, get_store, instrument, preload, start_follower, startup_step
+
 external_stylesheets = 'https://rsms.me/inter/inter.css'
 
-app = Dash(__name__, use_pages=True)
+# compress=True gzips/brotlis callback responses (Flask-Compress), figure json shrinks several times over
+# station layouts are functions that load data on the first visit, skipping callback validation keeps dash
+# from calling every one of them at startup (the station ids are all pattern-matching)
+with startup_step('dash app and pages'):
+    app = Dash(__name__, use_pages=True, compress=True, suppress_callback_exceptions=True)
 server = app.server
+# per-callback stage timings (Server-Timing header on sampled requests), response sizes and cache hit rates
+# at /metrics in the prometheus text format
+instrument(server)
+
+if PRELOAD:
+    with startup_step('preload'):
+        preload()
+if LIVE:
+    # appends new readings from the followed file / drop directory once the data is loaded
+    start_follower()
 
 colors = {
     'background_blue': '#0128b900',
@@ -21,31 +38,48 @@ colors = {
     'text_black': '#212529'
 }
 
-app.layout = html.Div(style={'backgroundColor': colors['background_blue']}, children=[
-    html.Div(style={'text-align': 'center', 'padding': '20px'}, className="logo", children=[
-        html.Img(style={'width': '50%'}, src='/assets/adaptive-artifacts-logo.png')
-    ]),
-
-    html.Div(children='Data from April to September 2022', style={
-        'textAlign': 'center',
-        'color': 'white',
-        'font-family': "'Inter', 'sans-serif'",
-        'padding-bottom': '20px'
-    }),
-
-    html.Div(style={'display': 'flex', 'flex-direction': 'row', 'justify-content': 'center'}, children=[
-            html.Div(style={'padding': '20px'}, children=[
-                dcc.Link(
-                    f"{page['name']}", href=page["relative_path"]
+
+def data_period():
+    # the months the readings of every station span, they grow with the followed data
+    store = get_store()
+    ranges = [store.time_range(sensor_id) for sensor_id in store.station_ids()]
+    first = pd.Timestamp(min(first for first, _ in ranges))
+    last = pd.Timestamp(max(last for _, last in ranges))
+    if first.year == last.year:
+        return f'Data from {first:%B} to {last:%B %Y}'
+    return f'Data from {first:%B %Y} to {last:%B %Y}'
+
+
+def layout():
+    # rendered on every visit, so the period shown follows the data
+    return html.Div(style={'backgroundColor': colors['background_blue']}, children=[
+        html.Div(style={'text-align': 'center', 'padding': '20px'}, className="logo", children=[
+            html.Img(style={'width': '50%'}, src='/assets/adaptive-artifacts-logo.png')
+        ]),
+
+        html.Div(children=data_period(), style={
+            'textAlign': 'center',
+            'color': 'white',
+            'font-family': "'Inter', 'sans-serif'",
+            'padding-bottom': '20px'
+        }),
+
+        html.Div(style={'display': 'flex', 'flex-direction': 'row', 'justify-content': 'center'}, children=[
+                html.Div(style={'padding': '20px'}, children=[
+                    dcc.Link(
+                        f"{page['name']}", href=page["relative_path"]
+                    )
+                    ]
                 )
-                ]
-            )
-            for page in dash.page_registry.values()
-        ]
-    ),
-
-    dash.page_container,
-])
+                for page in dash.page_registry.values()
+            ]
+        ),
+
+        dash.page_container,
+    ])
+
+
+app.layout = layout
 if __name__ == '__main__':
     app.run_server(debug=True)
 
@@ -0,0 +1,131 @@
+// Clientside date range filtering for the station pages (AA_CLIENTSIDE=1), see stations/clientside.py
+
+(function () {
+    const DAY = 24 * 60 * 60 * 1000;
+    const decoded = new WeakMap();
+
+    // timestamps arrive as a start time in ms plus the gaps between readings in seconds
+    function times(data) {
+        let result = decoded.get(data);
+        if (result === undefined) {
+            result = new Float64Array(data.steps.length + 1);
+            result[0] = data.start;
+            for (let i = 0; i < data.steps.length; i++) {
+                result[i + 1] = result[i] + data.steps[i] * 1000;
+            }
+            decoded.set(data, result);
+        }
+        return result;
+    }
+
+    function lowerBound(values, target) {
+        let lo = 0;
+        let hi = values.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >>> 1;
+            if (values[mid] < target) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // whole days, the last selected day is included up to midnight
+    function dayRange(value) {
+        return [Date.parse(value[0]), Date.parse(value[1]) + DAY];
+    }
+
+    // keeps the lowest and highest reading of every bucket so peaks survive the reduction
+    function minMax(x, y, maxPoints) {
+        if (y.length <= maxPoints) {
+            return [x, y];
+        }
+        const buckets = Math.floor(maxPoints / 2);
+        const size = y.length / buckets;
+        const outX = [];
+        const outY = [];
+        for (let b = 0; b < buckets; b++) {
+            const lo = Math.floor(b * size);
+            const hi = Math.min(y.length, Math.floor((b + 1) * size));
+            let low = lo;
+            let high = lo;
+            for (let i = lo; i < hi; i++) {
+                if (y[i] < y[low]) low = i;
+                if (y[i] > y[high]) high = i;
+            }
+            const first = Math.min(low, high);
+            const second = Math.max(low, high);
+            outX.push(x[first]);
+            outY.push(y[first]);
+            if (second !== first) {
+                outX.push(x[second]);
+                outY.push(y[second]);
+            }
+        }
+        return [outX, outY];
+    }
+
+    // the card's own range, when set, overrides the page range
+    function line(pageValue, cardValue, data, figure) {
+        const value = cardValue || pageValue;
+        if (!value || !data || !figure) {
+            return window.dash_clientside.no_update;
+        }
+        const column = figure.layout.meta.column;
+        const values = data.columns[column];
+        const t = times(data);
+        const [start, end] = dayRange(value);
+        const x = [];
+        const y = [];
+        for (let i = lowerBound(t, start), hi = lowerBound(t, end); i < hi; i++) {
+            if (values[i] !== null) {
+                x.push(t[i]);
+                y.push(values[i]);
+            }
+        }
+        const [outX, outY] = minMax(x, y, data.max_points);
+        // the last trace is the line, the min/max band of rolled-up server figures is dropped
+        const trace = Object.assign({}, figure.data[figure.data.length - 1], {x: outX, y: outY});
+        const layout = Object.assign({}, figure.layout, {
+            xaxis: Object.assign({}, figure.layout.xaxis, {type: 'date', autorange: true}),
+            yaxis: Object.assign({}, figure.layout.yaxis, {autorange: true}),
+        });
+        return {data: [trace], layout: layout};
+    }
+
+    // sums the per-day direction x speed counts and rewrites the radius of every speed trace
+    function wind(pageValue, cardValue, data, figure) {
+        const value = cardValue || pageValue;
+        if (!value || !data || !data.wind || !figure) {
+            return window.dash_clientside.no_update;
+        }
+        const w = data.wind;
+        const cells = 16 * w.bins;
+        const days = w.counts.length / cells;
+        const [start, end] = dayRange(value);
+        const first = Math.max(0, Math.min(days, Math.round((start - w.first_day) / DAY)));
+        const last = Math.max(first, Math.min(days, Math.round((end - w.first_day) / DAY)));
+        const sums = new Float64Array(cells);
+        let total = 0;
+        for (let d = first; d < last; d++) {
+            for (let c = 0; c < cells; c++) {
+                sums[c] += w.counts[d * cells + c];
+                total += w.counts[d * cells + c];
+            }
+        }
+        const traces = figure.data.map(function (trace, k) {
+            const r = [];
+            for (let s = 0; s < 16; s++) {
+                r.push(total ? Math.round(sums[s * w.bins + k] * 10000 / total) / 100 : 0);
+            }
+            return Object.assign({}, trace, {r: r});
+        });
+        return {data: traces, layout: figure.layout};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        stations: {line: line, wind: wind},
+    });
+})();
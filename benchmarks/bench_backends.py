@@ -0,0 +1,91 @@
+# Compare the in-memory station store with the sqlite backend: build/open time and resident memory, then the
+# series and wind rose queries of random day ranges
+#
+#   python benchmarks/bench_backends.py --scale 10 --queries 50
+#
+# each backend runs in a fresh process so the reported memory is its own
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import generate  # noqa: E402
+from stations.store import BACKENDS  # noqa: E402
+
+METRICS = ('TMP', 'HMD', 'PRS')
+
+
+def _rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def _ranges(store, sensor_id, queries, seed):
+    first, last = (pd.Timestamp(t).date() for t in store.time_range(sensor_id))
+    days = pd.date_range(first, last).date
+    rng = np.random.default_rng(seed)
+    for _ in range(queries):
+        a, b = np.sort(rng.integers(0, len(days), 2))
+        yield days[a], days[b]
+
+
+def _run(backend, path, queries, seed):
+    cls = BACKENDS[backend]
+    start = time.perf_counter()
+    cls.load(path)
+    built = time.perf_counter() - start
+    # the second load is what every restart after the first one pays
+    start = time.perf_counter()
+    store = cls.load(path)
+    opened = time.perf_counter() - start
+    sensor_id = store.station_ids()[0]
+    ranges = list(_ranges(store, sensor_id, queries, seed))
+    timings = {}
+    start = time.perf_counter()
+    for first_day, last_day in ranges:
+        for metric in METRICS:
+            store.slice(sensor_id, first_day, last_day).series(metric)
+    timings['series'] = (time.perf_counter() - start) / len(ranges) * 1000
+    start = time.perf_counter()
+    for first_day, last_day in ranges:
+        store.slice(sensor_id, first_day, last_day).wind_table()
+    timings['wind'] = (time.perf_counter() - start) / len(ranges) * 1000
+    return built, opened, timings, _rss(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the station store backends')
+    parser.add_argument('--scale', type=int, default=10, help='multiple of the september export (183 days)')
+    parser.add_argument('--csv', help='use an existing export instead of generating one')
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.csv:
+            # the data cache and database are built next to a link in the temporary directory, not next to the
+            # export, and every run builds them anew
+            path = os.path.join(tmp, 'export.csv')
+            os.symlink(os.path.abspath(args.csv), path)
+        else:
+            path = os.path.join(tmp, 'synthetic.csv')
+            generate(days=183 * args.scale).to_csv(path, index=False)
+        print(f'{path}: {os.path.getsize(path) / 1e6:.0f} MB')
+        for backend in BACKENDS:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                built, opened, timings, rss, peak = pool.submit(_run, backend, path, args.queries, args.seed).result()
+            print(f'{backend:>8}: build {built:6.2f}s  open {opened:6.3f}s  series {timings["series"]:7.1f} ms  '
+                  f'wind {timings["wind"]:7.1f} ms  rss {rss:.0f} MB  peak {peak:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
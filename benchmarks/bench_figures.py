@@ -0,0 +1,47 @@
+# Report build time and serialized size of a station line figure: raw, LTTB-downsampled and from the rollups
+#
+#   python benchmarks/bench_figures.py --days 183 --freq 1min
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import plotly.io as pio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import generate  # noqa: E402
+from stations import MAX_POINTS, StationStore, line_figure, raw_series  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='time and size station figures')
+    parser.add_argument('--days', type=int, default=183)
+    parser.add_argument('--freq', default='10min')
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.csv')
+        generate(stations=1, days=args.days, freq=args.freq).to_csv(path, index=False)
+        store = StationStore.from_csv(path)
+    table, pyramid = store.station('WeatherStation1'), store.pyramid('WeatherStation1')
+    first_day, last_day = table.first_date(), table.last_date()
+
+    variants = {
+        'raw': lambda: raw_series(table, 'TMP', None),
+        f'lttb {args.max_points}': lambda: raw_series(table, 'TMP', args.max_points),
+        'pyramid': lambda: pyramid.series(table, 'TMP', first_day, last_day, args.max_points),
+    }
+    for label, series in variants.items():
+        start = time.perf_counter()
+        fig = line_figure(series(), 'Temperature', '#00ffbb', '#e6fff8', 'Temperature (°C)')
+        built = time.perf_counter() - start
+        payload = pio.to_json(fig)
+        print(f'{label:>12}: {len(fig.data[-1].x):7d} points  {len(payload) / 1024:8.0f} KiB  build {built * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Compare the legacy string-then-convert csv load with the typed ingestion path, and the whole-file
+# read + pivot into station tables with the chunked streaming reader
+#
+#   python benchmarks/bench_ingest.py --scale 10
+#
+# each variant runs in a fresh process so the reported peak RSS is its own
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import generate  # noqa: E402
+from stations.readings import CHUNK_ROWS, read_readings, read_station_tables  # noqa: E402
+from stations.store import StationStore  # noqa: E402
+
+
+def legacy_readings(path):
+    # the load every page used to run at import time
+    df = pd.read_csv(path, dtype={'event_date': 'string', 'sensor_id': 'string',
+                                  'sensor_value': 'string', 'event_type': 'string'})
+    df = df[~df.event_type.str.contains("CFT", na=False)]
+    df["event_date"] = pd.to_datetime(df["event_date"])
+    df["sensor_value"] = df["sensor_value"].astype(float)
+    return df
+
+
+def pivoted_tables(path):
+    return StationStore.from_csv(path, chunk_rows=0).stations
+
+
+def _run(name, path, chunk_rows):
+    loader = {'legacy': legacy_readings, 'typed': read_readings, 'pivot': pivoted_tables,
+              'chunked': lambda path: read_station_tables(path, chunk_rows)}[name]
+    start = time.perf_counter()
+    result = loader(path)
+    elapsed = time.perf_counter() - start
+    rows = sum(map(len, result.values())) if isinstance(result, dict) else len(result)
+    return elapsed, rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='time csv ingestion')
+    parser.add_argument('--scale', type=int, default=10, help='multiple of the september export (183 days)')
+    parser.add_argument('--csv', help='use an existing export instead of generating one')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp, 'synthetic.csv')
+            generate(days=183 * args.scale).to_csv(path, index=False)
+        print(f'{path}: {os.path.getsize(path) / 1e6:.0f} MB')
+        for name in ('legacy', 'typed', 'pivot', 'chunked'):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, rows, rss = pool.submit(_run, name, path, args.chunk_rows).result()
+            print(f'{name:>8}: {elapsed:6.2f}s  {rows} rows  peak rss {rss:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
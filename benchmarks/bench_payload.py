@@ -0,0 +1,76 @@
+# Report bytes on the wire and serialization time of a station line figure per encoding, engine and compression
+#
+#   python benchmarks/bench_payload.py --days 183 --freq 10min
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import generate  # noqa: E402
+from stations import MAX_POINTS, StationStore, encode_times, encode_values, raw_series  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def legacy_figure(series):
+    # what the pages sent before: iso timestamps and float32 readings as plain json
+    fig = go.Figure(go.Scatter(x=series.times, y=series.values.tolist(), mode='lines'))
+    fig.update_xaxes(title_text='Time')
+    return fig
+
+
+def encoded_figure(series, typed):
+    times, values = encode_times(series.times, typed), encode_values(series.values, typed)
+    fig = go.Figure(go.Scatter(x=times, y=values, mode='lines'))
+    fig.update_xaxes(title_text='Time', type='date')
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description='size and serialize station figure payloads')
+    parser.add_argument('--days', type=int, default=183)
+    parser.add_argument('--freq', default='10min')
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.csv')
+        generate(stations=1, days=args.days, freq=args.freq).to_csv(path, index=False)
+        store = StationStore.from_csv(path)
+    table = store.station('WeatherStation1')
+
+    for label, max_points in (('raw', None), (f'lttb {args.max_points}', args.max_points)):
+        series = raw_series(table, 'TMP', max_points)
+        print(f'{label}: {len(series.times)} points')
+        figures = {
+            'legacy': legacy_figure(series),
+            'json lists': encoded_figure(series, typed=False),
+            'typed arrays': encoded_figure(series, typed=True),
+        }
+        for name, fig in figures.items():
+            for engine in ('json', 'orjson'):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    payload = to_json_plotly(fig, engine=engine).encode()
+                took = (time.perf_counter() - start) / args.repeat
+                sizes = [len(payload), len(gzip.compress(payload, 6))]
+                if brotli is not None:
+                    sizes.append(len(brotli.compress(payload, quality=4)))
+                sizes = '  '.join(f'{size / 1024:8.0f}' for size in sizes)
+                print(f'  {name:>12} {engine:>6}: {sizes} KiB (json gzip br)  serialize {took * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Time the long-to-wide reshape of every station: the pivot_table calls the pages used to make against the
+# category-code scatter of reshape_station, and check that they agree
+#
+#   python benchmarks/bench_reshape.py --scale 10 --duplicates 0.01
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import generate  # noqa: E402
+from stations.readings import READING_DTYPES, drop_comfort_scores, reshape_station  # noqa: E402
+
+
+def legacy_pivot(readings):
+    # the pages' reshape, with the per-row date objects they kept in the index
+    readings = readings.assign(event_date_dp=readings["event_date"].dt.date)
+    table = readings.pivot_table(index=["event_date", "event_date_dp"], columns="event_type", values="sensor_value",
+                                 observed=True)
+    return table.reset_index()
+
+
+def plain_pivot(readings):
+    return readings.pivot_table(index="event_date", columns="event_type", values="sensor_value", observed=True)
+
+
+def synthetic_readings(scale, duplicates, seed=0):
+    readings = generate(days=183 * scale, seed=seed).astype(
+        {column: dtype for column, dtype in READING_DTYPES.items() if column != 'event_date'})
+    readings["event_date"] = pd.to_datetime(readings["event_date"])
+    if duplicates:
+        # resent readings: the same timestamp and sensor type with another value
+        repeated = readings.sample(frac=duplicates, random_state=seed)
+        repeated = repeated.assign(sensor_value=repeated["sensor_value"] + 1)
+        readings = pd.concat([readings, repeated], ignore_index=True)
+    return drop_comfort_scores(readings)
+
+
+def timed(reshape, stations):
+    start = time.perf_counter()
+    tables = [reshape(group) for group in stations]
+    return time.perf_counter() - start, tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description='time the long-to-wide reshape')
+    parser.add_argument('--scale', type=int, default=10, help='multiple of the september export (183 days)')
+    parser.add_argument('--duplicates', type=float, default=0.01, help='fraction of readings sent twice')
+    parser.add_argument('--grid', help='also time reshape_station onto this regular grid, e.g. 10min')
+    args = parser.parse_args()
+
+    readings = synthetic_readings(args.scale, args.duplicates)
+    stations = [group for _, group in readings.groupby("sensor_id", sort=True, observed=True)]
+    print(f'{len(readings)} readings, {len(stations)} stations')
+
+    variants = {'legacy pivot': legacy_pivot, 'pivot_table': plain_pivot}
+    for duplicates in ('mean', 'first', 'last'):
+        variants[f'codes ({duplicates})'] = lambda group, duplicates=duplicates: reshape_station(group, duplicates)
+    if args.grid:
+        variants[f'codes (grid {args.grid})'] = lambda group: reshape_station(group, grid=args.grid)
+    results = {}
+    for name, reshape in variants.items():
+        elapsed, results[name] = timed(reshape, stations)
+        print(f'{name:>20}: {elapsed:6.2f}s')
+
+    for expected, table in zip(results['pivot_table'], results['codes (mean)']):
+        assert np.array_equal(expected.index.to_numpy(), table.times)
+        for column in expected.columns:
+            assert np.allclose(expected[column].to_numpy(), table[str(column)], equal_nan=True, atol=1e-3), column
+    print('codes (mean) matches pivot_table')
+
+
+if __name__ == '__main__':
+    main()
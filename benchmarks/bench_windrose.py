@@ -0,0 +1,69 @@
+# Validate the numpy wind rose binning against rosely and time both
+#
+#   python benchmarks/bench_windrose.py --samples 1000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from rosely import WindRose as WR
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stations import frequency_table, wind_counts  # noqa: E402
+
+
+def rosely_frequencies(ws, wd, normed=True):
+    # the path the station pages used before the numpy engine
+    wind_df = pd.DataFrame({'WSP': ws, 'WDR': wd})
+    wind_df = wind_df[(wind_df['WSP'] >= 0.05) | (wind_df['WSP'].isnull())]  # remove outliers / negatives
+    wind_df.rename(columns={'WSP': 'ws', 'WDR': 'wd'}, inplace=True)
+    wind_rose = WR(wind_df)
+    wind_rose.calc_stats(normed=normed)
+    return wind_rose.wind_df
+
+
+def synthetic_wind(samples, seed=0):
+    rng = np.random.default_rng(seed)
+    ws = rng.gamma(2.0, 4.0, samples) - 0.5  # includes the negative readings the outlier rule drops
+    wd = rng.uniform(0, 360, samples).round(1)  # rounding puts readings on the sector edges
+    ws[rng.random(samples) < 0.02] = np.nan
+    wd[rng.random(samples) < 0.02] = np.nan
+    return ws, wd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='validate and time wind rose binning')
+    parser.add_argument('--samples', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    ws, wd = synthetic_wind(args.samples)
+
+    timings = {}
+    for name, run in (('rosely', lambda: rosely_frequencies(ws, wd)),
+                      ('numpy', lambda: frequency_table(*wind_counts(ws, wd)))):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = run()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, result)
+        print(f'{name:>7}: {best * 1000:8.1f} ms')
+
+    # counts have to match exactly, rosely keeps one row per 11.25° half sector so its rows are summed per label
+    expected = rosely_frequencies(ws, wd, normed=False).groupby(['direction', 'speed'], observed=True)['frequency']
+    expected = expected.sum().astype(np.int64)
+    counts, edges = wind_counts(ws, wd)
+    actual = frequency_table(counts, edges).assign(frequency=counts.T.ravel()).set_index(['direction', 'speed'])
+    actual = actual['frequency']
+    expected, actual = expected[expected > 0], actual[actual > 0]
+    assert len(expected) == len(actual), 'bins differ from rosely'
+    assert (expected.to_numpy() == actual.reindex(expected.index).to_numpy()).all(), 'counts differ from rosely'
+    print(f'counts match rosely, numpy is {timings["rosely"][0] / timings["numpy"][0]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
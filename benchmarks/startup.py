@@ -0,0 +1,112 @@
+# Profile a worker's cold start: the time from launching python to the first station page drawn, split into
+# importing the app, the first layout and the first callback, plus the initialization steps timed with
+# AA_STARTUP_PROFILE=1 and the heaviest imports reported by python -X importtime
+#
+#   python benchmarks/startup.py --csv adaptive_artifacts_data_septend.csv --runs 5
+#
+# "warm" starts find the data cache next to the csv (every restart after the first), "cold" ones build it
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# run in a fresh interpreter from the repository root, prints the wall clock time of every milestone
+CHILD = '''
+import json, sys, time
+marks = {}
+import app
+marks['imported'] = time.time()
+import dash
+from benchmarks.suite import StationPage
+import pandas as pd
+from stations import get_store
+page = next(iter(dash.page_registry.values()))
+page['layout']()
+marks['layout'] = time.time()
+sensor_id = page['layout'].args[0]
+first, last = (str(pd.Timestamp(t).date()) for t in get_store().time_range(sensor_id))
+StationPage(app.server.test_client(), sensor_id).post([first, last], {}, None)
+marks['callback'] = time.time()
+print(json.dumps(marks))
+'''
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def launch(env, importtime=False):
+    # with importtime only the app is imported, the figure libraries loaded by the first callback are not
+    # part of the boot
+    command = [sys.executable] + (['-X', 'importtime', '-c', 'import app'] if importtime else ['-c', CHILD])
+    started = time.time()
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    if importtime:
+        return None, None, result.stderr
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    timings = {
+        'import app': marks['imported'] - started,
+        'first layout': marks['layout'] - marks['imported'],
+        'first callback': marks['callback'] - marks['layout'],
+        'cold start': marks['callback'] - started,
+    }
+    steps = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('startup: '):
+            name, seconds = line[len('startup: '):].rsplit(' ', 1)
+            steps[name] = steps.get(name, 0.0) + float(seconds)
+    return timings, steps, result.stderr
+
+
+def heaviest_imports(stderr, count):
+    # the modules imported directly by the app (and python's own top-level imports), by cumulative time
+    imports = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) // 2 <= 1:
+            imports.append((int(match.group(2)) / 1e6, match.group(4)))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='profile the startup of a worker')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'adaptive_artifacts_data_septend.csv'))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=15, help='heaviest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # the data cache is built next to a link in the temporary directory, not next to the export
+        path = os.path.join(tmp, 'export.csv')
+        os.symlink(os.path.abspath(args.csv), path)
+        env = dict(os.environ, AA_DATA_FILE=path, AA_STARTUP_PROFILE='1', AA_PRELOAD='0', AA_FOLLOW='0',
+                   AA_DROP_DIR='', PYTHONPATH=ROOT)
+        results = {}
+        for mode in ('cold', 'warm'):
+            runs = []
+            for _ in range(args.runs):
+                if mode == 'cold':
+                    shutil.rmtree(f'{path}.cache', ignore_errors=True)
+                runs.append(launch(env))
+            results[mode] = runs
+            print(f'{mode} start, median of {args.runs} runs')
+            for name in runs[0][0]:
+                print(f'  {name:>28}: {statistics.median(run[0][name] for run in runs):7.3f} s')
+            for name in runs[0][1]:
+                print(f'  {"step " + name:>28}: {statistics.median(run[1].get(name, 0) for run in runs):7.3f} s')
+        _, _, stderr = launch(env, importtime=True)
+    print('heaviest imports (python -X importtime, cumulative)')
+    for seconds, name in heaviest_imports(stderr, args.imports):
+        print(f'  {name:>40}: {seconds:7.3f} s')
+
+
+if __name__ == '__main__':
+    main()
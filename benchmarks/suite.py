@@ -0,0 +1,291 @@
+# Benchmark suite: generates a synthetic export, times csv load, reshape, the data cache, the station page
+# callbacks and the wind rose, measures memory and payload sizes, and compares the results with the last run
+#
+#   python benchmarks/suite.py --stations 4 --days 183 --freq 10min
+#   python benchmarks/suite.py --days 1830 --rate WSP=1min --rate WDR=1min --label windy
+#   python benchmarks/suite.py --compare benchmarks/results/baseline.json --threshold 0.2
+#
+# every stage runs in a fresh process (the data file is configured through AA_* before stations is imported),
+# so its peak RSS is its own; the stages after cache open the data cache it wrote, like a restart. Results go to
+# benchmarks/results/<scenario>-<time>.json; a run compares itself with the newest earlier file of the same
+# scenario and exits with 1 when a number grew by more than the threshold.
+
+import argparse
+import glob
+import gzip
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synth import SENSOR_TYPES, generate, parse_rates  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+LINE_METRICS = ('TMP', 'HMD', 'PRS')
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def stage_load(path):
+    from stations import read_readings
+
+    seconds, readings = _timed(read_readings, path)
+    return {'seconds': seconds, 'rows': len(readings), 'peak_rss_mb': _peak_rss()}
+
+
+def stage_reshape(path):
+    from stations import read_readings, reshape_station
+
+    readings = read_readings(path)
+    groups = [group for _, group in readings.groupby("sensor_id", sort=True, observed=True)]
+    pivot_seconds, _ = _timed(lambda: [group.pivot_table(index="event_date", columns="event_type",
+                                                         values="sensor_value", observed=True) for group in groups])
+    seconds, _ = _timed(lambda: [reshape_station(group) for group in groups])
+    return {'seconds': seconds, 'pivot_table_seconds': pivot_seconds, 'peak_rss_mb': _peak_rss()}
+
+
+def stage_chunked(path):
+    from stations import read_station_tables
+
+    seconds, tables = _timed(read_station_tables, path)
+    return {'seconds': seconds, 'stations': len(tables), 'peak_rss_mb': _peak_rss()}
+
+
+def stage_cache(path):
+    from stations import StationStore
+
+    build_seconds, _ = _timed(StationStore.load, path)
+    seconds, store = _timed(StationStore.load, path)
+    station_seconds, _ = _timed(store.station, store.station_ids()[0])
+    return {'build_seconds': build_seconds, 'open_seconds': seconds, 'first_station_seconds': station_seconds,
+            'peak_rss_mb': _peak_rss()}
+
+
+def stage_wind(path):
+    import pandas as pd
+    from stations import get_store
+
+    store = get_store()
+    sensor_id = store.station_ids()[0]
+    first, last = (pd.Timestamp(time).date() for time in store.time_range(sensor_id))
+    month = (pd.Timestamp(last) - pd.Timedelta(days=30)).date()
+    results = {}
+    for label, first_day in (('all', first), ('month', max(first, month))):
+        seconds, _ = _timed(store.wind_table, sensor_id, first_day, last)
+        results[f'{label}_seconds'] = seconds
+    results['peak_rss_mb'] = _peak_rss()
+    return results
+
+
+class StationPage:
+    # posts the station page callback the way the browser does
+
+    def __init__(self, client, sensor_id):
+        self.client = client
+        self.sensor_id = sensor_id
+        self.dependency = next(dependency for dependency in client.get('/_dash-dependencies').json
+                               if 'station-graph' in dependency['output'] and 'figure' in dependency['output'])
+
+    def component_id(self, kind, metric=None):
+        component = {'type': kind, 'station': self.sensor_id}
+        if metric is not None:
+            component['metric'] = metric
+        return component
+
+    def changed(self, component, prop):
+        return json.dumps(component, sort_keys=True, separators=(',', ':')) + '.' + prop
+
+    def post(self, page, cards, wind, triggered=None):
+        component = self.component_id
+        body = {
+            'output': self.dependency['output'],
+            'outputs': [[{'id': component('station-graph', metric), 'property': 'figure'} for metric in LINE_METRICS],
+                        {'id': component('station-wind-graph'), 'property': 'figure'}],
+            'inputs': [{'id': component('station-page-range'), 'property': 'value', 'value': page},
+                       [{'id': component('station-range', metric), 'property': 'value', 'value': cards.get(metric)}
+                        for metric in LINE_METRICS],
+                       {'id': component('station-wind-range'), 'property': 'value', 'value': wind}],
+            'changedPropIds': [self.changed(triggered, 'value')] if triggered else [],
+        }
+        start = time.perf_counter()
+        response = self.client.post('/_dash-update-component', json=body)
+        seconds = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f'callback failed with {response.status_code}: {response.data[:200]!r}')
+        return {'seconds': seconds, 'bytes': len(response.data), 'gzip_bytes': len(gzip.compress(response.data, 6))}
+
+
+def stage_callbacks(path):
+    import pandas as pd
+
+    seconds, app = _timed(importlib.import_module, 'app')
+    from stations import get_store
+
+    store = get_store()
+    sensor_id = store.station_ids()[0]
+    first, last = (pd.Timestamp(time).date() for time in store.time_range(sensor_id))
+    full = [str(first), str(last)]
+    week = [str(max(first, (pd.Timestamp(last) - pd.Timedelta(days=6)).date())), str(last)]
+    page = StationPage(app.server.test_client(), sensor_id)
+
+    results = {'import_seconds': seconds}
+    results['initial'] = page.post(full, {}, None)
+    results['initial_cached'] = page.post(full, {}, None)
+    results['page_range'] = page.post(week, {}, None, page.component_id('station-page-range'))
+    # a card picker redraws one line figure, what each update_output_* callback used to do
+    for metric in LINE_METRICS:
+        card = page.component_id('station-range', metric)
+        results[f'card_{metric}'] = page.post(full, {metric: week}, None, card)
+    results['wind_range'] = page.post(full, {}, week, page.component_id('station-wind-range'))
+    results['peak_rss_mb'] = _peak_rss()
+    return results
+
+
+STAGES = {
+    'load': stage_load,
+    'reshape': stage_reshape,
+    'chunked': stage_chunked,
+    'cache': stage_cache,
+    'wind': stage_wind,
+    'callbacks': stage_callbacks,
+}
+
+
+def _configure(env):
+    os.environ.update(env)
+
+
+def run_stage(name, path, env):
+    # a spawned interpreter reads the AA_* settings of this run when it imports stations
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_configure, initargs=(env,)) as pool:
+        return pool.submit(STAGES[name], path).result()
+
+
+def best(runs):
+    # the lowest of every number over repeated runs of a stage, the least disturbed by the rest of the machine
+    if isinstance(runs[0], dict):
+        return {key: best([run[key] for run in runs]) for key in runs[0]}
+    return min(runs)
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)):
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def compare(previous, current, threshold):
+    # every number here is better lower: times, bytes and memory; returns the keys that regressed
+    old, new = flatten(previous['results']), flatten(current['results'])
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        if not old[key]:
+            continue
+        change = new[key] / old[key] - 1
+        regressed = change > threshold and not key.endswith(('rows', 'stations'))
+        if regressed:
+            regressions.append(key)
+        print(f'{key:>40}: {old[key]:12.4g} -> {new[key]:12.4g}  {change:+7.1%}{"  REGRESSED" if regressed else ""}')
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run the benchmark suite on a synthetic export')
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--days', type=int, default=183)
+    parser.add_argument('--freq', default='10min')
+    parser.add_argument('--types', default=','.join(SENSOR_TYPES), help='comma separated sensor types to write')
+    parser.add_argument('--rate', action='append', metavar='TYPE=FREQ', help='sample rate of one sensor type')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--csv', help='benchmark an existing export instead of generating one')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to run')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every stage, the best numbers are kept')
+    parser.add_argument('--label', help='scenario name of the results file, derived from the options by default')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--compare', help='results file to compare with instead of the last run of the scenario')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative growth reported as a regression')
+    args = parser.parse_args()
+
+    scenario = {'stations': args.stations, 'days': args.days, 'freq': args.freq, 'types': args.types.split(','),
+                'rates': parse_rates(args.rate), 'seed': args.seed, 'csv': args.csv, 'repeat': args.repeat}
+    label = args.label
+    if label is None and args.csv:
+        label = os.path.splitext(os.path.basename(args.csv))[0]
+    elif label is None:
+        label = f'{args.stations}st-{args.days}d-{args.freq}'
+        if scenario['types'] != list(SENSOR_TYPES):
+            label += '-' + '.'.join(scenario['types'])
+        label += ''.join(f'-{event_type}{rate}' for event_type, rate in sorted(scenario['rates'].items()))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp, 'synthetic.csv')
+            seconds, readings = _timed(generate, args.stations, args.days, args.freq, '2022-04-01', args.seed,
+                                       scenario['types'], scenario['rates'])
+            readings.to_csv(path, index=False)
+            results['generate'] = {'seconds': seconds, 'rows': len(readings)}
+        print(f'{label}: {path} {os.path.getsize(path) / 1e6:.0f} MB')
+        results['source_mb'] = os.path.getsize(path) / 1e6
+        # the data cache and databases go to the temporary directory, not next to an existing export
+        env = {'AA_DATA_FILE': os.path.abspath(path), 'AA_FOLLOW': '0', 'AA_DROP_DIR': '', 'AA_PRELOAD': '0'}
+        if args.csv:
+            os.symlink(os.path.abspath(path), os.path.join(tmp, 'export.csv'))
+            env['AA_DATA_FILE'] = os.path.join(tmp, 'export.csv')
+        for name in args.stages.split(','):
+            results[name] = best([run_stage(name, env['AA_DATA_FILE'], env) for _ in range(args.repeat)])
+            for key, value in flatten(results[name], f'{name}.').items():
+                print(f'{key:>40}: {value:12.4g}')
+
+    run = {'scenario': scenario, 'label': label, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(),
+           'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    previous = args.compare
+    if previous is None:
+        earlier = sorted(glob.glob(os.path.join(args.results_dir, f'{label}-*.json')))
+        previous = earlier[-1] if earlier else None
+    os.makedirs(args.results_dir, exist_ok=True)
+    out = os.path.join(args.results_dir, f'{label}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    with open(out, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f'wrote {out}')
+
+    if previous is not None:
+        with open(previous) as f:
+            previous_run = json.load(f)
+        print(f'compared with {previous} ({previous_run.get("commit")})')
+        if compare(previous_run, run, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
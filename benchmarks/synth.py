@@ -0,0 +1,75 @@
+# Generate synthetic long-format sensor exports with the same schema as adaptive_artifacts_data_septend.csv
+#
+#   python benchmarks/synth.py out.csv --stations 4 --days 183 --freq 10min
+#   python benchmarks/synth.py out.csv --types TMP,WSP,WDR,CFT --rate WSP=1min --rate WDR=1min
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# event_type -> (mean, spread) of the generated values
+SENSOR_TYPES = {
+    'TMP': (15.0, 6.0),
+    'HMD': (65.0, 15.0),
+    'PRS': (1012.0, 6.0),
+    'WSP': (8.0, 5.0),
+    'WDR': (180.0, 100.0),
+    'CFT': (50.0, 15.0),  # comfort scores, dropped by the loader
+}
+
+
+def parse_rates(rates):
+    # ['WSP=1min', ...] -> {'WSP': '1min', ...}
+    parsed = dict(rate.split('=', 1) for rate in rates or ())
+    unknown = set(parsed) - set(SENSOR_TYPES)
+    if unknown:
+        raise ValueError(f'unknown sensor types {sorted(unknown)}, expected some of {list(SENSOR_TYPES)}')
+    return parsed
+
+
+def generate(stations=4, days=183, freq='10min', start='2022-04-01', seed=0, types=None, rates=None):
+    # types: the sensor types to write (all of SENSOR_TYPES, comfort scores included, by default),
+    # rates: {event_type: frequency} for the types not sampled every freq
+    rng = np.random.default_rng(seed)
+    types = list(SENSOR_TYPES) if types is None else list(types)
+    rates = rates or {}
+    end = pd.Timestamp(start) + pd.Timedelta(days=days)
+    event_dates = {}
+    for event_type in types:
+        rate = rates.get(event_type, freq)
+        if rate not in event_dates:
+            event_dates[rate] = pd.date_range(start, end, freq=rate, inclusive='left').strftime('%Y-%m-%d %H:%M:%S')
+    frames = []
+    for station in range(1, stations + 1):
+        for event_type in types:
+            mean, spread = SENSOR_TYPES[event_type]
+            event_date = event_dates[rates.get(event_type, freq)]
+            values = mean + spread * rng.standard_normal(len(event_date))
+            if event_type == 'WDR':
+                values = np.mod(values, 360)
+            frames.append(pd.DataFrame({'event_date': event_date, 'sensor_id': f'WeatherStation{station}',
+                                        'sensor_value': values.round(2), 'event_type': event_type}))
+    # exports are not ordered by station or type
+    readings = pd.concat(frames, ignore_index=True)
+    return readings.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='generate a synthetic sensor export')
+    parser.add_argument('out')
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--days', type=int, default=183)
+    parser.add_argument('--freq', default='10min')
+    parser.add_argument('--types', default=','.join(SENSOR_TYPES), help='comma separated sensor types to write')
+    parser.add_argument('--rate', action='append', metavar='TYPE=FREQ', help='sample rate of one sensor type')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    readings = generate(args.stations, args.days, args.freq, seed=args.seed, types=args.types.split(','),
+                        rates=parse_rates(args.rate))
+    readings.to_csv(args.out, index=False)
+    print(f'wrote {len(readings)} rows to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+# Serve the app with gunicorn, e.g.
+#
+#   gunicorn -c gunicorn.conf.py -w 8 -b 0.0.0.0:8050 app:server
+#
+# the master process imports the app and loads every station before it forks the workers, so the data is read
+# (or its cache built) once and the workers share the loaded tables instead of each holding a copy: cached tables
+# are memory-mapped read-only and shared through the page cache, tables read from the csv stay in the master's
+# pages, which the workers only read. AA_SHARE_DATA=0 goes back to every worker loading the data itself.
+
+import os
+
+preload_app = os.environ.get('AA_SHARE_DATA', '1') == '1'
+if preload_app:
+    # read by stations when app is imported, after this file
+    os.environ.setdefault('AA_PRELOAD', '1')
+
+
+def pre_fork(server, worker):
+    from stations import before_fork
+
+    before_fork()
+
+
+def post_fork(server, worker):
+    from stations import after_fork
+
+    after_fork()
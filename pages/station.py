@@ -0,0 +1,343 @@
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+import dash
+from dash import ctx, dcc, html
+from dash.dependencies import ALL, MATCH, Input, Output, State
+# dash serves the scripts of the component libraries imported by the time the index page is rendered, so
+# dmc is imported here rather than in the layout that uses it
+import dash_mantine_components as dmc
+
+from stations import (BACKGROUND, CLIENTSIDE, FOLLOW_INTERVAL, LIVE, MAX_POINTS, background_callback, cached_figure,
+                      cached_payload, clientside_figure, day_bounds, discover_stations, encode_times, encode_values,
+                      get_store, line_figure, serve_clientside, once, server_callback, stage, startup_step)
+
+external_stylesheets = 'https://rsms.me/inter/inter.css'
+
+colors = {
+    'background_blue': '#0d27b2',
+    'highlight_green': '#00ffbb',
+    'light_green': '#e6fff8',
+    'highlight_orange': '#FEA13D',
+    'light_orange': '#ffeedc',
+    'highlight_red': '#FF674E',
+    'light_red': '#faecea',
+    'highlight_yellow': '#F2D734',
+    'text_black': '#212529'
+
+}
+
+# Wind Speed: WSP  Km/H
+# Wind Direction: WDR °
+# Temperature: TMP °C
+# Humidity: HMD %
+# Barometric Pressure: PRS HPa
+
+# line cards in page order: column -> (title, border color, background color, y axis title)
+LINE_CARDS = {
+    'TMP': ('Temperature', 'highlight_green', 'light_green', 'Temperature (°C)'),
+    'HMD': ('Humidity', 'highlight_orange', 'light_orange', 'Humidity (%)'),
+    'PRS': ('Barometric Pressure', 'highlight_red', 'light_red', 'Pressure (HPa)'),
+}
+
+# every station page shares these pattern-matching ids, so the callback count does not grow with the stations
+PAGE_RANGE = {'type': 'station-page-range', 'station': MATCH}
+GRAPH = {'type': 'station-graph', 'station': MATCH, 'metric': MATCH}
+RANGE = {'type': 'station-range', 'station': MATCH, 'metric': MATCH}
+WIND_GRAPH = {'type': 'station-wind-graph', 'station': MATCH}
+WIND_RANGE = {'type': 'station-wind-range', 'station': MATCH}
+# the wind rose pairs speed and direction readings
+WIND_COLUMNS = {'WSP', 'WDR'}
+WIND_JOB = {'type': 'station-wind-job', 'station': MATCH}
+DATA = {'type': 'station-data', 'station': MATCH}
+INTERVAL = {'type': 'station-interval', 'station': MATCH}
+LAST_SENT = {'type': 'station-last-sent', 'station': MATCH}
+REDRAW = {'type': 'station-redraw', 'station': MATCH}
+ALL_GRAPHS = dict(GRAPH, metric=ALL)
+ALL_RANGES = dict(RANGE, metric=ALL)
+
+
+def station_number(sensor_id):
+    match = re.search(r'(\d+)$', sensor_id)
+    return int(match.group(1)) if match else None
+
+
+def station_order(sensor_id):
+    # numbered stations first and in numeric order, so WeatherStation10 follows WeatherStation9
+    number = station_number(sensor_id)
+    return number is None, number or 0, sensor_id
+
+
+def short_name(sensor_id):
+    # "WeatherStation1" -> "WS1", used in the figure titles
+    number = station_number(sensor_id)
+    return sensor_id if number is None else f"WS{number}"
+
+
+def page_slug(sensor_id):
+    number = station_number(sensor_id)
+    return re.sub(r'\W+', '_', sensor_id.lower()) if number is None else f"ws{number}"
+
+
+def page_name(sensor_id):
+    number = station_number(sensor_id)
+    return sensor_id if number is None else f"Weather Station {number:02d}"
+
+
+def last_reading(times):
+    # epoch ms of the newest reading
+    return encode_times(times[-1:], typed=False)[0]
+
+
+def date_range_picker(picker_id, full_range, shared=True):
+    # the page picker holds the range of every graph, a card picker left empty follows it
+    return dmc.DateRangePicker(
+        id=picker_id,
+        label="Date Range" if shared else "Date Range (this graph)",
+        placeholder=None if shared else "Same as the page",
+        minDate=full_range[0],
+        maxDate=full_range[1],
+        value=full_range if shared else None,
+        style={"width": 310, 'padding': '0 0 0 0', 'font-family': "'Inter', 'sans-serif'"},
+        amountOfMonths=2,
+        hideOutsideDates=True,
+        clearable=not shared,
+        initialMonth=full_range[0],
+    )
+
+
+def card(highlight, graph, picker):
+    return html.Div(style={'background-color': '#ffffff', 'border': '5px solid', 'border-color': colors[highlight],
+                           'padding': '20px', 'margin': '20px'},
+                    children=[graph, picker])
+
+
+@cached_figure
+def build_line(sensor_id, metric, value, station_slice):
+    if value is not None:
+        title, highlight, light, y_title = LINE_CARDS[metric]
+        days = station_slice(value)
+        with stage('aggregate'):
+            series = days.series(metric)
+        with stage('build'):
+            return line_figure(series, f"{short_name(sensor_id)} {title}", colors[highlight], colors[light], y_title)
+
+
+@cached_figure
+def build_wind(sensor_id, kind, value, station_slice):
+    if value is not None:
+        days = station_slice(value)
+        with stage('aggregate'):
+            wr_df = days.wind_table()
+
+        with stage('build'):
+            # plotly express (and the pandas plotting machinery behind it) loads on the first wind rose
+            import plotly.express as px
+
+            fig = px.bar_polar(wr_df, r="frequency", theta="direction",
+                               color="speed", template="plotly_white",
+                               color_discrete_sequence=px.colors.sequential.Plasma_r,
+                               title=f"{short_name(sensor_id)} Wind Speed Distribution (Km/H)")
+            fig.update_layout(title_font_color=colors['text_black'], font_color=colors['text_black'])
+        return fig
+
+
+def slicer(sensor_id):
+    # figures showing the same days share one parsed and sliced StationSlice
+    slices = {}
+
+    def station_slice(value):
+        key = tuple(value)
+        if key not in slices:
+            with stage('filter'):
+                slices[key] = get_store().slice(sensor_id, value[0], value[1])
+        return slices[key]
+    return station_slice
+
+
+def station_layout(sensor_id, **query):
+    # called on every visit of the page (dash passes the url query), the station data is loaded on the first one
+    with once('first layout'):
+        return _station_layout(sensor_id)
+
+
+def has_wind(sensor_id):
+    return WIND_COLUMNS <= set(get_store().columns(sensor_id))
+
+
+def _station_layout(sensor_id):
+    first, last = get_store().time_range(sensor_id)
+    columns = get_store().columns(sensor_id)
+    full_range = [pd.Timestamp(first).date(), pd.Timestamp(last).date()]
+    station_slice = slicer(sensor_id)
+    page_picker = date_range_picker({'type': 'station-page-range', 'station': sensor_id}, full_range)
+    cards = [html.Div(style={'display': 'flex', 'justify-content': 'center', 'margin': '20px'}, children=[page_picker])]
+    for metric, (_, highlight, _, _) in LINE_CARDS.items():
+        if metric not in columns:
+            # only the sensor types the station reported get a card
+            continue
+        graph = dcc.Graph(id={'type': 'station-graph', 'station': sensor_id, 'metric': metric})
+        if CLIENTSIDE:
+            graph.figure = clientside_figure(build_line(sensor_id, metric, full_range, station_slice), metric)
+        picker = date_range_picker({'type': 'station-range', 'station': sensor_id, 'metric': metric}, full_range,
+                                   shared=False)
+        cards.append(card(highlight, graph, picker))
+
+    graph = dcc.Graph(id={'type': 'station-wind-graph', 'station': sensor_id})
+    wind_picker = date_range_picker({'type': 'station-wind-range', 'station': sensor_id}, full_range, shared=False)
+    # the range the wind rose is drawn for in the background
+    wind_job = [dcc.Store(id={'type': 'station-wind-job', 'station': sensor_id})] if BACKGROUND else []
+    if not has_wind(sensor_id):
+        # the page callback has the wind graph and picker as an output and input of every station, a station
+        # without wind sensors keeps them hidden and they are never drawn
+        cards.append(html.Div(style={'display': 'none'}, children=[graph, wind_picker] + wind_job))
+    else:
+        if CLIENTSIDE:
+            graph.figure = clientside_figure(build_wind(sensor_id, 'wind', full_range, station_slice), 'wind')
+        elif BACKGROUND:
+            # the graph shows a spinner until the background job has drawn it
+            graph = html.Div(children=[dcc.Loading(graph, type='circle')] + wind_job)
+        cards.append(card('highlight_yellow', graph, wind_picker))
+
+    if CLIENTSIDE:
+        cards.append(dcc.Store(id={'type': 'station-data', 'station': sensor_id},
+                               data=cached_payload(sensor_id, tuple(LINE_CARDS))))
+    elif LIVE:
+        # the newest reading the open graphs hold, new ones are sent with extendData
+        cards.append(dcc.Store(id={'type': 'station-last-sent', 'station': sensor_id},
+                               data=last_reading(np.array([last]))))
+        cards.append(dcc.Interval(id={'type': 'station-interval', 'station': sensor_id},
+                                  interval=FOLLOW_INTERVAL * 1000))
+        # the line cards whose figure new readings change other than by appending them
+        cards.append(dcc.Store(id={'type': 'station-redraw', 'station': sensor_id}))
+    return html.Div(children=cards)
+
+
+# one route per station found in the data, the first one is the home page; only the station ids are read here
+with startup_step('discover stations'):
+    sensor_ids = sorted(discover_stations(), key=station_order)
+for order, sensor_id in enumerate(sensor_ids):
+    dash.register_page(
+        f"pages.{page_slug(sensor_id)}",
+        path='/' if order == 0 else f"/{page_slug(sensor_id)}",
+        title=page_name(sensor_id),
+        name=page_name(sensor_id),
+        order=order,
+        layout=functools.partial(station_layout, sensor_id),
+    )
+
+
+@server_callback(
+    Output(ALL_GRAPHS, "figure"),
+    Output(WIND_JOB, "data") if BACKGROUND else Output(WIND_GRAPH, "figure"),
+    Input(PAGE_RANGE, "value"),
+    Input(ALL_RANGES, "value"),
+    Input(WIND_RANGE, "value"),
+    *([Input(REDRAW, "data")] if LIVE else []),
+)
+def update_station(value, card_values, wind_value, redraw_cards=None):
+    # one request per page view: every figure whose range changed is rebuilt from a shared slice
+    sensor_id = ctx.outputs_list[1]['id']['station']
+    metrics = [output['id']['metric'] for output in ctx.outputs_list[0]]
+    card_values = {picker['id']['metric']: picker.get('value') for picker in ctx.inputs_list[1]}
+    triggered = ctx.triggered_id
+    station_slice = slicer(sensor_id)
+
+    def redraw(picker_type, card_value, metric=None):
+        # the first call draws every figure, the page picker the figures without a range of their own
+        # and a card picker only its own figure
+        if triggered is None:
+            return True
+        if triggered['type'] == 'station-page-range':
+            return not card_value
+        if triggered['type'] == 'station-redraw':
+            return metric in redraw_cards['metrics']
+        return triggered['type'] == picker_type and triggered.get('metric') == metric
+
+    figures = []
+    for metric in metrics:
+        card_value = card_values.get(metric)
+        if redraw('station-range', card_value, metric):
+            figures.append(build_line(sensor_id, metric, card_value or value, station_slice))
+        else:
+            figures.append(dash.no_update)
+    wind = dash.no_update
+    if redraw('station-wind-range', wind_value) and has_wind(sensor_id):
+        # in the background mode only the range is sent on, draw_wind builds the figure
+        wind = wind_value or value if BACKGROUND else build_wind(sensor_id, 'wind', wind_value or value, station_slice)
+    return figures, wind
+
+
+if BACKGROUND:
+    @background_callback(
+        Output(WIND_GRAPH, "figure"),
+        Input(WIND_JOB, "data"),
+        prevent_initial_call=True,
+    )
+    def draw_wind(value):
+        # runs in a process forked from the worker, the request that started it has already returned
+        sensor_id = ctx.outputs_list['id']['station']
+        return build_wind(sensor_id, 'wind', value, slicer(sensor_id))
+
+
+if LIVE:
+    @server_callback(
+        Output(ALL_GRAPHS, "extendData"),
+        Output(LAST_SENT, "data"),
+        Output(REDRAW, "data"),
+        Output(PAGE_RANGE, "maxDate"),
+        Output(ALL_RANGES, "maxDate"),
+        Output(WIND_RANGE, "maxDate"),
+        Input(INTERVAL, "n_intervals"),
+        State(LAST_SENT, "data"),
+        State(PAGE_RANGE, "value"),
+        State(ALL_RANGES, "value"),
+    )
+    def extend_station(n_intervals, last_sent, value, card_values):
+        # only the readings newer than the last one sent, appended to the line of every graph whose range
+        # reached the newest data; the wind rose is redrawn on the next range change
+        sensor_id = ctx.outputs_list[1]['id']['station']
+        card_values = {picker['id']['metric']: picker.get('value') for picker in ctx.states_list[2]}
+        added = get_store().readings_after(sensor_id, np.datetime64(last_sent, 'ms')) if last_sent else None
+        if added is None or not len(added):
+            return ([dash.no_update] * len(ctx.outputs_list[0]), dash.no_update, dash.no_update, dash.no_update,
+                    [dash.no_update] * len(ctx.outputs_list[4]), dash.no_update)
+        station_slice = slicer(sensor_id)
+        extensions = []
+        redraw = []
+        for output in ctx.outputs_list[0]:
+            metric = output['id']['metric']
+            day_range = card_values.get(metric) or value
+            values = added[metric] if metric in added else None
+            end = day_bounds(*day_range)[1] if day_range is not None else None
+            # a range that held the newest reading follows the data as it grows, up to its last day
+            if values is None or end is None or end <= np.datetime64(last_sent, 'ms'):
+                extensions.append(dash.no_update)
+                continue
+            keep = added.present(metric) & (added.times < end)
+            if not keep.any():
+                extensions.append(dash.no_update)
+                continue
+            series = station_slice(day_range).series(metric)
+            if series.low is not None or len(series) >= MAX_POINTS:
+                # bucket means and downsampled lines are redrawn (update_station) rather than mixed with raw
+                # readings, the range now holds more readings than a raw line draws
+                extensions.append(dash.no_update)
+                redraw.append(metric)
+                continue
+            # a raw line holding every reading of the range, maxPoints bounds it like a redraw would
+            extensions.append([{'x': [encode_times(added.times[keep], typed=False)],
+                                'y': [encode_values(values[keep], typed=False)]}, [-1], MAX_POINTS])
+        newest = last_reading(added.times)
+        # the pickers reach the day of the newest reading
+        max_date = pd.Timestamp(added.times[-1]).date()
+        # the newest reading makes every redraw a change of the store, so it triggers even for the same cards
+        return (extensions, newest, {'metrics': redraw, 'newest': newest} if redraw else dash.no_update, max_date,
+                [max_date] * len(ctx.outputs_list[4]), max_date)
+
+
+if CLIENTSIDE:
+    serve_clientside(GRAPH, [PAGE_RANGE, RANGE], DATA, 'line')
+    serve_clientside(WIND_GRAPH, [PAGE_RANGE, WIND_RANGE], DATA, 'wind')
@@ -0,0 +1,23 @@
+from .startup import STARTUP_PROFILE, once, startup_step
+from .readings import (CHUNK_ROWS, DUPLICATE_POLICIES, DUPLICATES, GRID, assemble_station, complete_size,
+                       drop_comfort_scores, long_to_wide, open_source, parse_dates, read_readings, read_station_tables,
+                       reshape_station)
+from .store import (BACKEND, BACKENDS, DATA_FILE, PRELOAD, LazyMapping, StationSlice, StationStore, append_readings,
+                    discover_stations, get_store, loaded_store, on_append, on_reload, preload, reload_store)
+from .sqlstore import SqliteSlice, SqliteStore, build_database, database_path
+from .table import StationTable, day_bounds
+from .downsample import MAX_POINTS, downsample, lttb
+from .encoding import TYPED_ARRAYS, encode_times, encode_values, typed_arrays_supported
+from .figures import line_figure
+from .pyramid import LEVELS, METRICS, Pyramid, Series, level_series, raw_series
+from .wind import SECTOR_LABELS, WindIndex, frequency_table, wind_counts, wind_rose_table
+from .sharedcache import DiskCache, shared_cache
+from .figcache import FigureCache, cached_figure, figure_cache
+from .timing import STAGES, RequestTiming, stage, timed_callback
+from .clientside import (CLIENTSIDE, cached_payload, clientside_figure, serve_clientside, server_callback,
+                         station_payload)
+from .background import BACKGROUND, BACKGROUND_DIR, BACKGROUND_EXPIRE, background_callback, background_manager
+from .metrics import METRICS_PATH, METRICS_SAMPLE, Metrics, instrument, metrics
+from .ingest import (DROP_DIR, FOLLOW, FOLLOW_INTERVAL, LIVE, DropDirectory, Follower, TailReader,
+                     start_follower, stop_follower)
+from .workers import after_fork, before_fork
@@ -0,0 +1,41 @@
+import os
+import uuid
+
+from dash.dependencies import Input
+
+from .clientside import CLIENTSIDE, server_callback
+
+# AA_BACKGROUND_DIR draws the wind rose in a process of its own (dash's DiskcacheManager, results kept in a
+# diskcache at that directory): the callback request returns at once and the browser polls for the figure, so
+# no web worker thread waits on it. A newer range cancels the job still drawing the previous one, leaving the
+# page cancels it too. Unset, the wind rose is drawn in the request like the line figures; pages served
+# clientside draw it in the browser either way
+BACKGROUND_DIR = os.environ.get('AA_BACKGROUND_DIR') or None
+BACKGROUND = BACKGROUND_DIR is not None and not CLIENTSIDE
+# seconds a result stays in the cache after it was fetched
+BACKGROUND_EXPIRE = float(os.environ.get('AA_BACKGROUND_EXPIRE', 60))
+# the location component of dash pages, its path changes when the user leaves a page
+PAGES_LOCATION = '_pages_location'
+
+_manager = None
+
+
+def background_manager(directory=BACKGROUND_DIR):
+    # diskcache, multiprocess and psutil are only needed with AA_BACKGROUND_DIR
+    global _manager
+    if _manager is None:
+        import diskcache
+        from dash import DiskcacheManager
+
+        # dash keys a result by the callback's arguments and drops it once fetched, two pages drawing the same
+        # range at the same time would race for one result: every request gets a key of its own instead
+        _manager = DiskcacheManager(diskcache.Cache(directory), cache_by=[lambda: uuid.uuid4().hex],
+                                    expire=BACKGROUND_EXPIRE)
+    return _manager
+
+
+def background_callback(*args, **kwargs):
+    # a server_callback run by the background manager, a later call from the same page terminates the running
+    # job (dash sends it along as the old job) and so does navigating away
+    return server_callback(*args, background=True, manager=background_manager(),
+                           cancel=[Input(PAGES_LOCATION, 'pathname')], **kwargs)
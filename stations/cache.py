@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# bump whenever the layout of the cached arrays changes so old caches are rebuilt
+CACHE_VERSION = 9
+
+CACHE_ENABLED = os.environ.get('AA_CACHE', '1') != '0'
+# size and mtime catch normal edits, hashing also catches copies that keep both (e.g. deploys)
+CACHE_HASH = os.environ.get('AA_CACHE_HASH', '0') == '1'
+
+META_FILE = 'meta.json'
+
+
+def cache_path(source):
+    # the cache lives next to the csv it was built from, one directory per cached version of the source
+    return f'{source}.cache'
+
+
+def _file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_signature(source, hash_contents=CACHE_HASH):
+    stat = os.stat(source)
+    signature = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if hash_contents:
+        signature['sha256'] = _file_hash(source)
+    return signature
+
+
+def signature_version(signature):
+    # short stable id of a source signature (or any json-serializable state)
+    return hashlib.sha1(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def _version_dir(path, signature):
+    return os.path.join(path, signature_version(signature))
+
+
+class Partitions(Mapping):
+    # the cached arrays as one .npy file per key ("<station>/<column>", ...), memory-mapped read-only on access:
+    # slicing reads only the pages it touches and every worker shares the same pages through the os page cache
+
+    def __init__(self, directory, keys, lock=None):
+        self.directory = directory
+        self._keys = keys
+        # the open meta file holding a shared lock on the version for as long as the arrays may be read, closed
+        # (and the lock released) with the mapping
+        self._lock = lock
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        values = np.load(os.path.join(self.directory, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+        # a plain ndarray view, the memmap stays alive as its base
+        return values.view(np.ndarray)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def load_cache(path, signature):
+    # returns (meta, arrays) or None when the cache is missing, unreadable or stale
+    directory = _version_dir(path, signature)
+    meta_path = os.path.join(directory, META_FILE)
+    try:
+        f = open(meta_path, encoding='utf-8')
+    except OSError:
+        return None
+    try:
+        if fcntl is not None:
+            # keeps save_cache from removing the version while its files are still to be mapped
+            fcntl.flock(f, fcntl.LOCK_SH)
+            if not os.path.exists(meta_path):
+                # removed between the open and the lock
+                raise OSError(f'{directory} was removed')
+        meta = json.load(f)
+    except (OSError, ValueError):
+        f.close()
+        return None
+    if meta.get('signature') != signature:
+        f.close()
+        return None
+    return meta, Partitions(directory, set(meta['arrays']), f)
+
+
+def _remove_unused(directory):
+    # removes a cache version no process reads from any more: every open one holds a shared lock on its meta file
+    if fcntl is None:
+        return
+    try:
+        with open(os.path.join(directory, META_FILE), 'rb') as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            shutil.rmtree(directory, ignore_errors=True)
+    except BlockingIOError:
+        # still open, removed by a later rebuild once the workers reading it are gone
+        pass
+    except OSError:
+        # a version without meta was never complete
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def save_cache(path, signature, arrays, meta=None):
+    meta = dict(meta or {}, signature=signature, arrays=sorted(arrays))
+    directory = _version_dir(path, signature)
+    # write to a private directory first and rename it into place, so concurrent workers never read a
+    # half-written cache
+    tmp = f'{directory}.{os.getpid()}.tmp'
+    try:
+        for key, values in arrays.items():
+            os.makedirs(os.path.dirname(os.path.join(tmp, key)), exist_ok=True)
+            np.save(os.path.join(tmp, f'{key}.npy'), np.ascontiguousarray(values), allow_pickle=False)
+        with open(os.path.join(tmp, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.rename(tmp, directory)
+    except OSError as exc:
+        if not os.path.isdir(directory):
+            logger.warning('could not write data cache %s: %s', directory, exc)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    # older versions go once no process has them open, stores only map a station's files on its first use
+    for name in os.listdir(path):
+        if name != os.path.basename(directory) and not name.endswith('.tmp'):
+            _remove_unused(os.path.join(path, name))
@@ -0,0 +1,77 @@
+import functools
+import os
+
+import numpy as np
+from dash import ClientsideFunction, callback, clientside_callback
+from dash.dependencies import Input, Output, State
+
+from .downsample import MAX_POINTS
+from .encoding import encode_values
+from .store import get_store, on_append, on_reload
+from .timing import timed_callback
+
+# ship each station's arrays to the browser once and filter date ranges there instead of on the server
+CLIENTSIDE = os.environ.get('AA_CLIENTSIDE', '0') == '1'
+
+
+def server_callback(*args, **kwargs):
+    # a regular dash callback (timed when the request is sampled), or the undecorated function when the page
+    # is served clientside
+    if CLIENTSIDE:
+        return lambda function: function
+    register = callback(*args, **kwargs)
+    return lambda function: register(timed_callback(function))
+
+
+def _epoch_ms(times):
+    return times.astype('datetime64[ms]').astype(np.int64)
+
+
+def station_payload(store, sensor_id, columns):
+    # compact columnar form: the first timestamp in ms and the gaps between readings in seconds
+    table = store.station(sensor_id)
+    times = _epoch_ms(table.times)
+    payload = {
+        'start': int(times[0]) if len(times) else 0,
+        'steps': (np.diff(times) // 1000).tolist(),
+        'columns': {column: encode_values(table[column], typed=False) for column in columns if column in table},
+        'max_points': MAX_POINTS,
+    }
+    index = store.wind_index(sensor_id)
+    if index is not None:
+        payload['wind'] = {
+            'first_day': int(_epoch_ms(index.days[:1])[0]),
+            'bins': index.counts.shape[2],
+            'counts': index.counts.ravel().tolist(),
+        }
+    return payload
+
+
+@functools.lru_cache(maxsize=None)
+def cached_payload(sensor_id, columns):
+    # station layouts are built on every visit, the payload only once per station and data version
+    return station_payload(get_store(), sensor_id, list(columns))
+
+
+on_reload(cached_payload.cache_clear)
+on_append(lambda sensor_id, since: cached_payload.cache_clear())
+
+
+def clientside_figure(fig, column):
+    # the full-range server figure the browser re-slices, tagged with the column it plots
+    fig = fig if isinstance(fig, dict) else fig.to_plotly_json()
+    fig['layout'] = dict(fig['layout'], meta={'column': column})
+    return fig
+
+
+def serve_clientside(graph, pickers, data, function_name):
+    # graph, pickers (page range, card override) and data are (pattern-matching) ids; the figure is re-sliced in
+    # the browser by stations.line or stations.wind whenever a picker changes
+    clientside_callback(
+        ClientsideFunction(namespace='stations', function_name=function_name),
+        Output(graph, 'figure'),
+        *[Input(picker, 'value') for picker in pickers],
+        State(data, 'data'),
+        State(graph, 'figure'),
+        prevent_initial_call=True,
+    )
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+# upper bound of points sent to the browser per trace, peaks and troughs survive the reduction
+MAX_POINTS = int(os.environ.get('AA_MAX_POINTS', 2000))
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the first and last point and, from every bucket in between,
+    # the point forming the largest triangle with the previously kept point and the next bucket's mean.
+    # Returns the indices of the kept points so callers can take any aligned column with them.
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets between the fixed end points, plus the last point as the final "bucket"
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y, edges[:-1]) / sizes
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        avg_x, avg_y = mean_x[k + 1], mean_y[k + 1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        kept[k + 1] = a
+    return kept
+
+
+def downsample(times, values, max_points):
+    # drops missing readings (the traces connect gaps anyway) and reduces the rest to max_points
+    present = ~np.isnan(values)
+    if not present.all():
+        times, values = times[present], values[present]
+    if max_points is None or len(values) <= max_points:
+        return times, values
+    # relative int64 nanoseconds keep full precision once converted to float
+    x = (times - times[0]).astype('timedelta64[ns]').astype(np.int64)
+    kept = lttb(x, values, max_points)
+    return times[kept], values[kept]
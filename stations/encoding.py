@@ -0,0 +1,42 @@
+import os
+
+import dash
+import numpy as np
+import plotly
+
+# decimals kept for the readings sent as plain json lists
+JSON_DECIMALS = 3
+
+
+def _version(text):
+    return tuple(int(part) for part in text.split('.')[:2] if part.isdigit())
+
+
+def typed_arrays_supported():
+    # plotly 6 serializes numpy arrays as base64 typed arrays ({'dtype', 'bdata'}), which needs plotly.js 2.28;
+    # older dash bundles its own (older) plotly.js with dash_core_components instead of serving plotly's
+    setting = os.environ.get('AA_TYPED_ARRAYS')
+    if setting is not None:
+        return setting == '1'
+    if _version(plotly.__version__) < (6,) or not hasattr(dash.Dash, '_setup_plotlyjs'):
+        return False
+    from plotly.offline import get_plotlyjs_version
+    return _version(get_plotlyjs_version()) >= (2, 28)
+
+
+TYPED_ARRAYS = typed_arrays_supported()
+
+
+def encode_times(times, typed=TYPED_ARRAYS):
+    # epoch milliseconds instead of iso strings, plotly reads numbers on a date axis as ms since epoch (utc)
+    ms = times.astype('datetime64[ms]').astype(np.int64)
+    return ms.astype(np.float64) if typed else ms.tolist()
+
+
+def encode_values(values, typed=TYPED_ARRAYS):
+    # numpy arrays are sent as base64 typed arrays, plain lists keep a few decimals instead of float32 noise
+    values = np.asarray(values)
+    if typed:
+        return values.astype(np.float32)
+    values = np.round(values.astype(np.float64), JSON_DECIMALS)
+    return [None if np.isnan(value) else value for value in values.tolist()]
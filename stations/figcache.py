@@ -0,0 +1,125 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .sharedcache import shared_cache
+from .store import get_store, on_append, on_reload
+from .table import day_bounds
+
+FIGURE_CACHE_ENTRIES = int(os.environ.get('AA_FIGURE_CACHE_ENTRIES', 256))
+FIGURE_CACHE_BYTES = int(float(os.environ.get('AA_FIGURE_CACHE_MB', 64)) * 2 ** 20)
+
+# trace attributes that carry the data arrays of the figures the station pages build
+_DATA_ATTRIBUTES = ('x', 'y', 'r', 'theta')
+
+
+def figure_nbytes(fig):
+    # approximate size of a figure (a go.Figure or its dict form), dominated by its data arrays
+    size = 0
+    for trace in (fig['data'] if isinstance(fig, dict) else fig.data):
+        for attribute in _DATA_ATTRIBUTES:
+            values = trace[attribute] if attribute in trace else None
+            if isinstance(values, dict) and 'bdata' in values:
+                # plotly's base64 typed-array form
+                size += len(values['bdata']) * 3 // 4
+            elif values is not None:
+                size += np.asarray(values).nbytes
+    return size
+
+
+class FigureCache:
+    # thread-safe LRU of built figures, bounded by entry count and by approximate bytes
+
+    def __init__(self, max_entries=FIGURE_CACHE_ENTRIES, max_bytes=FIGURE_CACHE_BYTES, sizeof=figure_nbytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        # figures are built outside the lock, two requests missing together both build and the last one is kept
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def discard(self, predicate):
+        # drops every entry whose key matches predicate(key)
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+figure_cache = FigureCache()
+on_reload(figure_cache.clear)
+
+
+@on_append
+def _discard_appended(sensor_id, since):
+    # only the figures of that station whose range reaches the new readings are out of date
+    figure_cache.discard(lambda key: key[0] == sensor_id and day_bounds(key[2], key[3])[1] > since)
+
+
+def cached_figure(build, cache=figure_cache, shared=shared_cache):
+    # memoizes a figure builder called as build(sensor_id, kind, value, *args): the same station, graph and
+    # picker value returns the built figure, with a shared cache the figure built by one worker is reused by
+    # the others; the extra args only help building and are not part of the key
+    @functools.wraps(build)
+    def wrapper(sensor_id, kind, value, *args):
+        if value is None:
+            return build(sensor_id, kind, value, *args)
+        key = (sensor_id, kind, *value)
+        if shared is None:
+            return cache.get_or_build(key, lambda: build(sensor_id, kind, value, *args))
+        # workers may briefly hold different data, so the shared key also names the data version
+        shared_key = (get_store().version, *key)
+        return cache.get_or_build(
+            key, lambda: shared.get_or_build(shared_key, lambda: build(sensor_id, kind, value, *args).to_dict()))
+    return wrapper
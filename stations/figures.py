@@ -0,0 +1,30 @@
+from .encoding import encode_times, encode_values
+
+TEXT_BLACK = '#212529'
+
+
+def _rgba(hex_color, alpha):
+    red, green, blue = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    return f'rgba({red}, {green}, {blue}, {alpha})'
+
+
+def line_figure(series, title, line_color, bg_color, y_title):
+    # plotly's figure classes load on the first figure, not when a worker boots
+    import plotly.graph_objects as go
+
+    x = encode_times(series.times)
+    fig = go.Figure()
+    if series.low is not None:
+        # rolled-up series carry the min/max of every bucket, drawn as a band behind the mean
+        fig.add_trace(go.Scatter(x=x, y=encode_values(series.low), mode='lines', line=dict(width=0),
+                                 hoverinfo='skip', showlegend=False))
+        fig.add_trace(go.Scatter(x=x, y=encode_values(series.high), mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor=_rgba(line_color, 0.35), hoverinfo='skip',
+                                 showlegend=False))
+    fig.add_trace(go.Scatter(x=x, y=encode_values(series.values), connectgaps=True, mode='lines',
+                             line=dict(color=line_color), name='lines'))
+    fig.update_layout(title_text=title, font_family="Inter", plot_bgcolor=bg_color,
+                      title_font_color=TEXT_BLACK, font_color=TEXT_BLACK, showlegend=False)
+    fig.update_xaxes(title_text='Time', type='date')
+    fig.update_yaxes(title_text=y_title)
+    return fig
@@ -0,0 +1,180 @@
+import glob
+import io
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from .readings import FOLLOW
+from .store import DATA_FILE, append_readings, loaded_store, read_readings, reload_store
+
+logger = logging.getLogger(__name__)
+
+# follow rows appended to the data file (AA_FOLLOW, read with the data), and/or pick up csv files (same columns)
+# dropped into a directory
+DROP_DIR = os.environ.get('AA_DROP_DIR') or None
+FOLLOW_INTERVAL = float(os.environ.get('AA_FOLLOW_INTERVAL', 10))
+LIVE = FOLLOW or DROP_DIR is not None
+
+
+class TailReader:
+    # the complete lines written to a csv after offset, parsed with the file's header; the offset only moves
+    # past them on commit(), once they were appended
+
+    def __init__(self, path, offset):
+        self.path = path
+        self.offset = offset
+        self._end = offset
+        with open(path, 'rb') as f:
+            self.header = f.readline()
+
+    def truncated(self):
+        # the file was replaced by a shorter one, appending cannot catch up with that
+        return os.path.getsize(self.path) < self.offset
+
+    def read(self):
+        self._end = self.offset
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        # a line still being written is left for the next read
+        end = chunk.rfind(b'\n') + 1
+        if not end:
+            return None
+        try:
+            readings = read_readings(io.BytesIO(self.header + chunk[:end]))
+        except ValueError:
+            # one bad line would hold back every line after it: the lines are parsed one by one and the bad
+            # ones skipped
+            readings = self._read_lines(chunk[:end])
+        self._end = self.offset + end
+        return readings
+
+    def _read_lines(self, chunk):
+        frames = []
+        for line in chunk.splitlines(keepends=True):
+            try:
+                frames.append(read_readings(io.BytesIO(self.header + line)))
+            except ValueError as exc:
+                logger.warning('skipping a line of %s that could not be parsed (%s): %r', self.path, exc, line[:200])
+        if not frames:
+            return None
+        readings = pd.concat(frames, ignore_index=True)
+        return readings.astype({'sensor_id': 'category', 'event_type': 'category'})
+
+    def commit(self):
+        self.offset = self._end
+
+
+class DropDirectory:
+    # csv files that appeared in a directory since the last scan; writers should move finished files in. A file
+    # counts as seen on commit(), once its readings were appended or it turned out not to parse
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+        self._read = []
+
+    def read(self):
+        frames = []
+        self._read = []
+        for path in sorted(glob.glob(os.path.join(self.path, '*.csv'))):
+            if path in self.seen:
+                continue
+            try:
+                frames.append(read_readings(path))
+            except OSError:
+                # the other files still go in, this one is read again on the next scan
+                logger.exception('could not read %s', path)
+                continue
+            except ValueError:
+                # reading it again would fail the same way, it is skipped like a file already taken
+                logger.exception('skipping %s, it could not be parsed', path)
+            self._read.append(path)
+        return frames
+
+    def commit(self):
+        self.seen.update(self._read)
+        self._read = []
+
+
+class Follower:
+    # polls the sources every interval seconds and appends new readings to the loaded store; nothing is read
+    # before the store is, so a worker that never served a station stays idle
+
+    def __init__(self, path=DATA_FILE, follow=FOLLOW, drop_dir=DROP_DIR, interval=FOLLOW_INTERVAL):
+        self.path = path
+        self.follow = follow
+        self.drop = DropDirectory(drop_dir) if drop_dir else None
+        self.interval = interval
+        self._store = None
+        self._tail = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        store = loaded_store()
+        if store is None:
+            return {}
+        if store is not self._store:
+            # (re)loaded: the store holds the file up to the size it was read at
+            self._store = store
+            self._tail = TailReader(self.path, store.source_size) if self.follow else None
+        frames = []
+        if self._tail is not None:
+            if self._tail.truncated():
+                logger.info('%s was replaced, reloading', self.path)
+                reload_store()
+                return {}
+            frames.append(self._tail.read())
+        if self.drop is not None:
+            frames.extend(self.drop.read())
+        frames = [frame for frame in frames if frame is not None and len(frame)]
+        changed = {}
+        if frames:
+            readings = pd.concat(frames, ignore_index=True)
+            changed = append_readings(readings)
+            logger.info('appended %d readings to %s', len(readings), ', '.join(changed))
+        # the rows only count as taken now: when parsing or appending failed they are read again on the next poll
+        if self._tail is not None:
+            self._tail.commit()
+        if self.drop is not None:
+            self.drop.commit()
+        return changed
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('could not append new readings')
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='station-follower', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_follower = None
+
+
+def start_follower():
+    # one follower per process, starting it again returns the running one
+    global _follower
+    if _follower is None:
+        _follower = Follower().start()
+    return _follower
+
+
+def stop_follower():
+    # waits for a poll in progress, nothing is appended after this returns
+    global _follower
+    if _follower is not None:
+        _follower.stop()
+        _follower = None
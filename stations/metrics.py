@@ -0,0 +1,165 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, request
+
+from .clientside import cached_payload
+from .figcache import figure_cache
+from .sharedcache import shared_cache
+from .timing import STAGES, RequestTiming, set_timing
+
+# fraction of callback requests timed stage by stage (0 turns the timing off, the counters and cache stats
+# are always served); an unsampled request costs one random() call
+METRICS_SAMPLE = float(os.environ.get('AA_METRICS_SAMPLE', 0.1))
+METRICS_PATH = os.environ.get('AA_METRICS_PATH', '/metrics')
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALLBACK_PATH = '/_dash-update-component'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ','.join(f'{key}={json.dumps(str(value))}' for key, value in labels.items())
+
+
+class Metrics:
+    # in-process counters and histograms of the callback requests, rendered in the prometheus text format;
+    # every worker process serves its own numbers
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.sampled = defaultdict(int)
+        self.seconds = defaultdict(Histogram)
+        self.response_bytes = defaultdict(int)
+        self.response_max_bytes = defaultdict(int)
+
+    def count(self, status):
+        with self._lock:
+            self.requests[status] += 1
+
+    def record(self, timing, nbytes):
+        key = tuple(timing.labels.items())
+        with self._lock:
+            self.sampled[key] += 1
+            for name, seconds in timing.stages.items():
+                self.seconds[key + (('stage', name),)].observe(seconds)
+            self.response_bytes[key] += nbytes
+            self.response_max_bytes[key] = max(self.response_max_bytes[key], nbytes)
+
+    def _caches(self):
+        caches = {'figure': figure_cache.stats()}
+        if shared_cache is not None:
+            caches['shared'] = shared_cache.stats()
+        info = cached_payload.cache_info()
+        caches['payload'] = {'entries': info.currsize, 'hits': info.hits, 'misses': info.misses}
+        return caches
+
+    def render(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{{{_labels(labels)}}} {value}' if labels else f'{name} {value}')
+
+        with self._lock:
+            metric('station_callback_requests_total', 'counter', 'callback requests by response status',
+                   [({'status': status}, count) for status, count in sorted(self.requests.items())])
+            metric('station_callback_sampled_total', 'counter', 'callback requests timed by stage',
+                   [(dict(key), count) for key, count in sorted(self.sampled.items())])
+            metric('station_callback_sample_ratio', 'gauge', 'fraction of callback requests timed',
+                   [({}, METRICS_SAMPLE)])
+            lines.append('# HELP station_callback_seconds callback time by stage of the sampled requests')
+            lines.append('# TYPE station_callback_seconds histogram')
+            for key, histogram in sorted(self.seconds.items()):
+                labels = dict(key)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    bucket = _labels(dict(labels, le=bound))
+                    lines.append(f'station_callback_seconds_bucket{{{bucket}}} {cumulative}')
+                lines.append(f'station_callback_seconds_sum{{{_labels(labels)}}} {histogram.sum}')
+                lines.append(f'station_callback_seconds_count{{{_labels(labels)}}} {histogram.count}')
+            metric('station_callback_response_bytes_total', 'counter',
+                   'uncompressed response bytes of the sampled requests',
+                   [(dict(key), nbytes) for key, nbytes in sorted(self.response_bytes.items())])
+            metric('station_callback_response_max_bytes', 'gauge', 'largest uncompressed sampled response',
+                   [(dict(key), nbytes) for key, nbytes in sorted(self.response_max_bytes.items())])
+        caches = self._caches()
+        for name, help_text in (('hits', 'cache lookups answered from the cache'),
+                                ('misses', 'cache lookups that had to build'),
+                                ('evictions', 'entries dropped to stay in bounds')):
+            metric(f'station_cache_{name}_total', 'counter', help_text,
+                   [({'cache': cache}, stats[name]) for cache, stats in caches.items() if name in stats])
+        metric('station_cache_hit_ratio', 'gauge', 'hits over lookups since start',
+               [({'cache': cache}, stats['hits'] / max(1, stats['hits'] + stats['misses']))
+                for cache, stats in caches.items()])
+        metric('station_cache_entries', 'gauge', 'entries held',
+               [({'cache': cache}, stats['entries']) for cache, stats in caches.items()])
+        metric('station_cache_bytes', 'gauge', 'approximate bytes held',
+               [({'cache': cache}, stats['bytes']) for cache, stats in caches.items() if 'bytes' in stats])
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def _start():
+    if request.path != CALLBACK_PATH:
+        return
+    timing = None
+    if METRICS_SAMPLE > 0 and random.random() < METRICS_SAMPLE:
+        timing = g.station_timing = RequestTiming()
+    # always set, a worker thread must not carry the timing of a request that failed before _finish
+    set_timing(timing)
+
+
+def _finish(response):
+    if request.path != CALLBACK_PATH:
+        return response
+    metrics.count(response.status_code)
+    timing = g.pop('station_timing', None)
+    set_timing(None)
+    if timing is None:
+        return response
+    total = time.perf_counter() - timing.started
+    timing.stages['serialize'] = max(0.0, total - timing.body)
+    timing.stages['total'] = total
+    # runs before flask-compress (registered first, so called last): these are the uncompressed bytes
+    nbytes = response.calculate_content_length() or 0
+    metrics.record(timing, nbytes)
+    response.headers['Server-Timing'] = ', '.join(
+        f'{name};dur={timing.stages[name] * 1000:.1f}' for name in STAGES if name in timing.stages)
+    return response
+
+
+def instrument(server):
+    # times sampled callback requests, adds a Server-Timing header to them and serves METRICS_PATH
+    server.before_request(_start)
+    server.after_request(_finish)
+    server.add_url_rule(METRICS_PATH, 'station_metrics',
+                        lambda: Response(metrics.render(), mimetype='text/plain; version=0.0.4'))
+    return server
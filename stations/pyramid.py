@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+
+from .downsample import MAX_POINTS, downsample
+from .table import StationTable, day_bounds, to_datetime64
+
+# rollup levels from finest to coarsest, bucket width in seconds
+LEVELS = {'1min': 60, '15min': 15 * 60, '1h': 60 * 60, '1d': 24 * 60 * 60}
+METRICS = ('TMP', 'HMD', 'PRS', 'WSP')
+STATS = ('min', 'max', 'mean', 'count')
+
+# a level is used once it has at least this many buckets in the range, roughly the width of a graph in pixels
+MIN_POINTS = int(os.environ.get('AA_PYRAMID_MIN_POINTS', 1000))
+
+
+class Series:
+    # what a line chart draws: times and values, plus the min/max envelope when values are bucket means
+
+    def __init__(self, times, values, low=None, high=None):
+        self.times = times
+        self.values = values
+        self.low = low
+        self.high = high
+
+    def __len__(self):
+        return len(self.times)
+
+
+def _reduce(times, stats, starts):
+    # combine consecutive rows starting at each index in starts, stats holds metric -> (min, max, sum, count)
+    reduced = {}
+    for metric, (low, high, total, count) in stats.items():
+        reduced[metric] = (np.fmin.reduceat(low, starts), np.fmax.reduceat(high, starts),
+                           np.add.reduceat(total, starts), np.add.reduceat(count, starts))
+    return times[starts], reduced
+
+
+def _raw_stats(table, metrics):
+    stats = {}
+    for metric in metrics:
+        values = table[metric].astype(np.float64)
+        present = ~np.isnan(values)
+        stats[metric] = (values, values, np.where(present, values, 0.0), present.astype(np.int64))
+    return stats
+
+
+def _level_stats(level, metrics):
+    stats = {}
+    for metric in metrics:
+        count = level[f'{metric}_count'].astype(np.int64)
+        mean = np.nan_to_num(level[f'{metric}_mean'].astype(np.float64))
+        stats[metric] = (level[f'{metric}_min'], level[f'{metric}_max'], mean * count, count)
+    return stats
+
+
+def _to_level(times, stats):
+    columns = {}
+    for metric, (low, high, total, count) in stats.items():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        columns[f'{metric}_min'] = low.astype(np.float32)
+        columns[f'{metric}_max'] = high.astype(np.float32)
+        columns[f'{metric}_mean'] = np.where(count > 0, mean, np.nan).astype(np.float32)
+        columns[f'{metric}_count'] = count.astype(np.int32)
+    return StationTable(times, columns)
+
+
+class Pyramid:
+    # per-station rollups at several resolutions, each level is a StationTable of
+    # <metric>_min/_max/_mean/_count columns indexed by bucket start
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @classmethod
+    def build(cls, table, metrics=METRICS, levels=LEVELS):
+        metrics = [metric for metric in metrics if metric in table]
+        built = {}
+        if not len(table) or not metrics:
+            return cls(built)
+        # every level is rolled up from the one below it, the finest from the raw readings
+        times, stats = table.times, _raw_stats(table, metrics)
+        for name, step in levels.items():
+            buckets = times.astype('datetime64[s]').astype(np.int64) // step
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            _, stats = _reduce(times, stats, starts)
+            times = (buckets[starts] * step).astype('datetime64[s]')
+            built[name] = level = _to_level(times, stats)
+            stats = _level_stats(level, metrics)
+        return cls(built)
+
+    def extend(self, table, since, metrics=METRICS, levels=LEVELS):
+        # table already holds the new readings from since on; every level divides a day, so rolling up the
+        # readings from since's day onwards and keeping the older buckets gives the same result as a rebuild
+        day = to_datetime64(since).astype('datetime64[D]')
+        tail = Pyramid.build(table.take(int(np.searchsorted(table.times, day, side='left')), len(table)),
+                             metrics, levels)
+        if list(tail.levels) != list(self.levels) or any(
+                list(tail.levels[name].columns) != list(level.columns) for name, level in self.levels.items()):
+            # a metric appeared or disappeared, roll everything up again
+            return Pyramid.build(table, metrics, levels)
+        built = {}
+        for name, level in self.levels.items():
+            kept = level.take(0, int(np.searchsorted(level.times, day, side='left')))
+            added = tail.levels[name]
+            built[name] = StationTable(np.concatenate([kept.times, added.times]),
+                                       {column: np.concatenate([kept[column], added[column]])
+                                        for column in level.columns})
+        return Pyramid(built)
+
+    def level_for(self, column, start, end, min_points=MIN_POINTS):
+        # the coarsest level that still has min_points buckets between start and end
+        for name in reversed(list(self.levels)):
+            level = self.levels[name]
+            if f'{column}_mean' not in level:
+                return None
+            i, j = level.index_range(start, end)
+            if j - i >= min_points:
+                return level.take(i, j)
+        return None
+
+    def series(self, table, column, first_day, last_day, max_points=MAX_POINTS, min_points=MIN_POINTS):
+        # whole days from the date pickers, raw readings while they fit in max_points, rollups beyond that
+        start, end = day_bounds(first_day, last_day)
+        return self.series_between(table.between(start, end), column, start, end, max_points, min_points)
+
+    def series_between(self, selection, column, start, end, max_points=MAX_POINTS, min_points=MIN_POINTS):
+        # selection holds the raw readings with start <= event_date < end
+        if max_points is None or len(selection) <= max_points:
+            return raw_series(selection, column, max_points)
+        level = self.level_for(column, start, end, min_points)
+        if level is None:
+            return raw_series(selection, column, max_points)
+        return level_series(level, column, max_points)
+
+
+def raw_series(table, column, max_points):
+    return Series(*downsample(table.times, table[column], max_points))
+
+
+def level_series(level, column, max_points):
+    stats = _level_stats(level, [column])
+    present = stats[column][3] > 0
+    times = level.times[present]
+    stats = {column: tuple(values[present] for values in stats[column])}
+    if max_points is not None and len(times) > max_points:
+        # merge neighbouring buckets so the envelope keeps every extreme
+        starts = np.unique(np.linspace(0, len(times), max_points, endpoint=False).astype(np.int64))
+        times, stats = _reduce(times, stats, starts)
+    low, high, total, count = stats[column]
+    return Series(times, total / count, low, high)
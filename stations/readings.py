@@ -0,0 +1,229 @@
+import contextlib
+import io
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .startup import startup_step
+from .table import StationTable
+
+logger = logging.getLogger(__name__)
+
+# Wind Speed: WSP  Km/H
+# Wind Direction: WDR °
+# Temperature: TMP °C
+# Humidity: HMD %
+# Barometric Pressure: PRS HPa
+
+# parse straight into compact types instead of reading strings and converting afterwards
+READING_DTYPES = {'event_date': 'string', 'sensor_id': 'category', 'sensor_value': 'float32',
+                  'event_type': 'category'}
+DATE_FORMAT = os.environ.get('AA_DATE_FORMAT', '%Y-%m-%d %H:%M:%S')
+# rows per chunk of the streaming reader, peak memory follows it instead of the file size; 0 reads the whole
+# file at once
+CHUNK_ROWS = int(os.environ.get('AA_CHUNK_ROWS', 1_000_000))
+# readings of one sensor type sharing a timestamp are averaged (as pivot_table did), or the first or last one
+# in file order is kept
+DUPLICATE_POLICIES = ('mean', 'first', 'last')
+DUPLICATES = os.environ.get('AA_DUPLICATES', 'mean')
+# a pandas frequency ('10min') puts the station tables on a regular time grid, empty slots are NaN
+GRID = os.environ.get('AA_GRID') or None
+# the data file is being appended to (the follower reads what is added), it may end in a line still being written
+FOLLOW = os.environ.get('AA_FOLLOW', '0') == '1'
+
+
+def complete_size(path, size, follow=FOLLOW):
+    # how much of the first size bytes of path a load reads: all of them, or up to the last newline of a file
+    # being appended to, the line after it is read by the follower once it is complete
+    if not follow:
+        return size
+    with open(path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - 2 ** 16)
+            f.seek(start)
+            i = f.read(end - start).rfind(b'\n')
+            if i >= 0:
+                return start + i + 1
+            end = start
+    return 0
+
+
+class _Prefix(io.RawIOBase):
+    # the first size bytes of a binary file, what was appended after it was measured is not read
+
+    def __init__(self, handle, size):
+        self.handle = handle
+        self.left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.handle.readinto(memoryview(buffer)[:self.left])
+        self.left -= n
+        return n
+
+    def tell(self):
+        return self.handle.tell()
+
+
+@contextlib.contextmanager
+def open_source(path, size=None):
+    # the csv as a binary file, only its first size bytes unless size is None
+    with open(path, 'rb') as handle:
+        yield handle if size is None else io.BufferedReader(_Prefix(handle, size))
+
+
+def parse_dates(values, date_format=DATE_FORMAT):
+    try:
+        return pd.to_datetime(values, format=date_format)
+    except ValueError:
+        # exports with another timestamp layout still load, just through the slower generic parser
+        logger.warning('event_date does not match %r, falling back to format inference', date_format)
+        return pd.to_datetime(values)
+
+
+def drop_comfort_scores(df):
+    # remove Comfort Scores by comparing category codes, the string test only runs on the few categories
+    cft_codes = np.flatnonzero(df["event_type"].cat.categories.str.contains("CFT"))
+    return df[~np.isin(df["event_type"].cat.codes.to_numpy(), cft_codes)]
+
+
+def read_readings(path):
+    # read data from file and create table, clean up formats
+    df = pd.read_csv(path, dtype=READING_DTYPES)
+    df = drop_comfort_scores(df)
+    df["event_date"] = parse_dates(df["event_date"])  # convert date column to date format
+    return df
+
+
+def long_to_wide(times, codes, values, names, duplicates=DUPLICATES, grid=GRID):
+    # wide StationTable from long readings, codes[i] indexing names: every reading is scattered into one cell of
+    # a (sensor type, timestamp) block, cells without a reading stay NaN
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f'unknown duplicate policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}')
+    times = np.asarray(times).astype('datetime64[ns]')
+    if grid is not None:
+        # readings are floored onto the grid, which then runs without gaps from the first slot to the last
+        step = pd.Timedelta(grid).value
+        ns = times.view(np.int64)
+        times = (ns - ns % step).view('datetime64[ns]')
+    # sorting the integer view is several times faster than sorting datetime64
+    unique_times, row = np.unique(times.view(np.int64), return_inverse=True)
+    unique_times = unique_times.view('datetime64[ns]')
+    if grid is not None and len(unique_times):
+        slots = np.arange(unique_times[0], unique_times[-1] + np.timedelta64(step, 'ns'), np.timedelta64(step, 'ns'))
+        row = np.searchsorted(slots, unique_times)[row]
+        unique_times = slots
+    size = len(unique_times)
+    cell = np.asarray(codes, dtype=np.int64) * size + row
+    if duplicates == 'mean':
+        count = np.bincount(cell, minlength=len(names) * size)
+        total = np.bincount(cell, weights=values, minlength=len(names) * size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            wide = (total / count).astype(np.float32)
+    else:
+        # the position in file order of the first or last reading of every cell
+        position = np.arange(len(cell))
+        if duplicates == 'first':
+            chosen = np.full(len(names) * size, len(cell))
+            np.minimum.at(chosen, cell, position)
+        else:
+            chosen = np.full(len(names) * size, -1)
+            np.maximum.at(chosen, cell, position)
+        filled = (chosen >= 0) & (chosen < len(cell))
+        wide = np.full(len(names) * size, np.nan, dtype=np.float32)
+        wide[filled] = np.asarray(values)[chosen[filled]]
+    # one contiguous block per sensor type, the columns are views of it
+    wide = wide.reshape(len(names), size)
+    return StationTable(unique_times, {str(name): wide[i] for i, name in enumerate(names)})
+
+
+def reshape_station(readings, duplicates=DUPLICATES, grid=GRID):
+    # long-format readings of one station (as read_readings returns them) to a StationTable, one column per
+    # sensor type present
+    values = readings["sensor_value"].to_numpy(dtype=np.float32)
+    types = readings["event_type"].astype("category").cat
+    # a blank sensor type (code -1) is dropped like pivot_table did
+    present = ~np.isnan(values) & (types.codes.to_numpy() >= 0)
+    codes = types.codes.to_numpy()[present]
+    # only the sensor types this station reported become columns
+    used = np.flatnonzero(np.bincount(codes, minlength=len(types.categories)))
+    codes = np.searchsorted(used, codes)
+    return long_to_wide(readings["event_date"].to_numpy()[present], codes, values[present],
+                        types.categories[used].astype(str), duplicates, grid)
+
+
+class _ReadProgress:
+    # logs how far through the file the chunked reader is and how fast it goes
+
+    def __init__(self, path, handle, size=None):
+        self.path = path
+        self.handle = handle
+        self.size = os.path.getsize(path) if size is None else size
+        self.started = time.perf_counter()
+        self.rows = 0
+
+    def update(self, rows):
+        self.rows += rows
+        elapsed = time.perf_counter() - self.started
+        done = self.handle.tell()
+        logger.info('%s: %.0f%% read, %d rows in %.1f s (%.0f rows/s, %.1f MB/s)', self.path,
+                    100 * done / self.size if self.size else 100, self.rows, elapsed, self.rows / elapsed,
+                    done / elapsed / 1e6)
+
+
+def _split_chunk(chunk, parts):
+    # appends the (times, values) of every station and sensor type in the chunk to parts
+    chunk = drop_comfort_scores(chunk)
+    values = chunk["sensor_value"].to_numpy(dtype=np.float32)
+    stations = chunk["sensor_id"].cat
+    types = chunk["event_type"].cat
+    # a blank station or sensor type has code -1, which would be filed under another group; dropped like
+    # pivot_table did
+    present = ~np.isnan(values) & (stations.codes.to_numpy() >= 0) & (types.codes.to_numpy() >= 0)
+    times = parse_dates(chunk["event_date"]).to_numpy()[present]
+    values = values[present]
+    # one stable sort groups the rows by station then sensor type
+    key = (stations.codes.to_numpy()[present].astype(np.int64) * len(types.categories)
+           + types.codes.to_numpy()[present])
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.array([], dtype=np.int64)
+    for start, end in zip(starts, np.r_[starts[1:], len(key)]):
+        station, event_type = divmod(int(key[start]), len(types.categories))
+        rows = order[start:end]
+        parts.setdefault(str(stations.categories[station]), {}).setdefault(
+            str(types.categories[event_type]), []).append((times[rows], values[rows]))
+
+
+def assemble_station(types, duplicates=DUPLICATES, grid=GRID):
+    # wide table of one station from {event_type: [(times, values), ...]} parts
+    names = sorted(types)
+    parts = [(code, times, values) for code, name in enumerate(names) for times, values in types[name]]
+    if not parts:
+        return long_to_wide(np.array([], dtype='datetime64[ns]'), [], [], names, duplicates, grid)
+    codes = np.concatenate([np.full(len(times), code) for code, times, _ in parts])
+    return long_to_wide(np.concatenate([times for _, times, _ in parts]), codes,
+                        np.concatenate([values for _, _, values in parts]), names, duplicates, grid)
+
+
+def read_station_tables(path, chunk_rows=CHUNK_ROWS, duplicates=DUPLICATES, grid=GRID, size=None):
+    # streams the long-format export (its first size bytes) in chunks of chunk_rows: each chunk is filtered, typed
+    # and split into per-station, per-type columns, so only one chunk of the long table is in memory at a time
+    parts = {}
+    with startup_step('csv read'), open_source(path, size) as handle:
+        progress = _ReadProgress(path, handle, size)
+        for chunk in pd.read_csv(handle, dtype=READING_DTYPES, chunksize=chunk_rows):
+            _split_chunk(chunk, parts)
+            progress.update(len(chunk))
+    tables = {}
+    with startup_step('reshape'):
+        for sensor_id in sorted(parts):
+            # each station's parts are released as soon as its table is built
+            tables[sensor_id] = assemble_station(parts.pop(sensor_id), duplicates, grid)
+    return tables
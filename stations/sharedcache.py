@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# unset keeps results per process, point it at a local directory to share them between gunicorn workers
+SHARED_CACHE_DIR = os.environ.get('AA_SHARED_CACHE_DIR')
+SHARED_CACHE_TTL = float(os.environ.get('AA_SHARED_CACHE_TTL', 3600))
+SHARED_CACHE_BYTES = int(float(os.environ.get('AA_SHARED_CACHE_MB', 256)) * 2 ** 20)
+
+_SUFFIX = '.json'
+
+
+class DiskCache:
+    # json results (figure dicts) in one file per key, written atomically so any worker on the host can read them,
+    # entries expire after ttl seconds and the least recently used are removed beyond max_bytes; json rather than
+    # pickle, so whoever can write to the directory can only hand the workers data, not code to run
+
+    def __init__(self, directory, ttl=SHARED_CACHE_TTL, max_bytes=SHARED_CACHE_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + _SUFFIX)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                self._count(False)
+                return default
+            with open(path, 'rb') as f:
+                entry = json.load(f)
+            stored_key, value = entry['key'], entry['value']
+        except (OSError, ValueError, TypeError, KeyError):
+            self._count(False)
+            return default
+        # json has no tuples, keys are stored (and hashed) as their repr
+        if stored_key != repr(key):
+            self._count(False)
+            return default
+        # reads refresh the access time used for eviction, the mtime used for expiry is kept
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except OSError:
+            pass
+        self._count(True)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        # plotly's encoder (orjson when installed) writes the numpy arrays of a figure like dash sends them
+        from plotly.io.json import to_json_plotly
+
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(to_json_plotly({'key': repr(key), 'value': value}))
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning('could not write shared cache entry %s: %s', path, exc)
+            self._remove(tmp)
+            return
+        self.prune()
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def prune(self):
+        # drop expired entries, then the least recently read ones until the directory fits in max_bytes
+        now = time.time()
+        entries = []
+        for atime, mtime, size, path in self._entries():
+            if now - mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((atime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        for _, _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {'entries': len(entries), 'bytes': sum(entry[2] for entry in entries), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+shared_cache = DiskCache(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None
@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from .cache import signature_version, source_signature
+from .downsample import MAX_POINTS
+from .pyramid import Series
+from .readings import (CHUNK_ROWS, DUPLICATE_POLICIES, DUPLICATES, READING_DTYPES, assemble_station, complete_size,
+                       open_source, parse_dates)
+from .startup import startup_step
+from .table import day_bounds
+from .wind import WindIndex, frequency_table, wind_counts
+
+logger = logging.getLogger(__name__)
+
+# readings are stored as they come, comfort scores included; every query leaves those out. A reading sent again
+# unchanged is stored once: every worker follows the same csv and appends the same rows to the one database
+SCHEMA = '''
+CREATE TABLE readings (sensor_id TEXT NOT NULL, event_type TEXT NOT NULL, event_date INTEGER NOT NULL,
+                       sensor_value REAL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''
+# covering: range scans read the values from the index without visiting the table; unique, so appending rows
+# that are already stored inserts nothing
+INDEX = ('CREATE UNIQUE INDEX readings_station_type_date '
+         'ON readings (sensor_id, event_type, event_date, sensor_value)')
+# keeps the first of the rows repeating one reading, before the unique index is built over them
+DROP_REPEATS = ('DELETE FROM readings WHERE rowid NOT IN '
+                '(SELECT min(rowid) FROM readings GROUP BY sensor_id, event_type, event_date, sensor_value)')
+RANGE = 'sensor_id = ? AND event_type = ? AND event_date >= ? AND event_date < ? AND sensor_value IS NOT NULL'
+# one (event_date, sensor_value) row per timestamp of a RANGE, readings sharing a timestamp are averaged or the
+# first or last one inserted (in file order) is kept like AA_DUPLICATES does for the other backend; sqlite takes
+# a bare column from the row holding the min() or max() of the group
+DEDUPLICATED = {
+    'mean': f'SELECT event_date, avg(sensor_value) AS sensor_value FROM readings WHERE {RANGE} GROUP BY event_date',
+    'first': f'SELECT event_date, sensor_value, min(rowid) FROM readings WHERE {RANGE} GROUP BY event_date',
+    'last': f'SELECT event_date, sensor_value, max(rowid) FROM readings WHERE {RANGE} GROUP BY event_date',
+}
+
+
+def database_path(source):
+    # the database lives next to the csv it was built from
+    return f'{source}.sqlite'
+
+
+def _seconds(times):
+    return np.asarray(times).astype('datetime64[s]').astype(np.int64)
+
+
+def _times(seconds):
+    return np.asarray(seconds, dtype=np.int64).astype('datetime64[s]').astype('datetime64[ns]')
+
+
+def _read_meta(path):
+    # {key: value} of a database, None when it is missing or unreadable
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as connection:
+            return {key: json.loads(value) for key, value in connection.execute('SELECT key, value FROM meta')}
+    except sqlite3.Error:
+        return None
+
+
+def _insert(connection, readings):
+    # long-format readings (typed as READING_DTYPES, dates parsed) into the readings table, NaN values as NULL
+    values = readings["sensor_value"].to_numpy(dtype=np.float64)
+    rows = zip(readings["sensor_id"].astype(str).tolist(), readings["event_type"].astype(str).tolist(),
+               _seconds(readings["event_date"].to_numpy()).tolist(),
+               [None if np.isnan(value) else value for value in values.tolist()])
+    connection.executemany('INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)', rows)
+
+
+def _station_types(pairs, types=None):
+    # {sensor_id: sorted sensor types} from (sensor_id, event_type) pairs, merged into types
+    types = {sensor_id: set(event_types) for sensor_id, event_types in (types or {}).items()}
+    for sensor_id, event_type in pairs:
+        types.setdefault(sensor_id, set()).add(event_type)
+    return {sensor_id: sorted(types[sensor_id]) for sensor_id in sorted(types)}
+
+
+def build_database(source, path, signature, chunk_rows=CHUNK_ROWS, size=None):
+    # loads the csv (its first size bytes) in chunks into a private file, indexes it and renames it into place
+    tmp = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    connection = sqlite3.connect(tmp)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(SCHEMA)
+        with open_source(source, size) as handle:
+            for chunk in pd.read_csv(handle, dtype=READING_DTYPES, chunksize=chunk_rows or None):
+                chunk["event_date"] = parse_dates(chunk["event_date"])
+                _insert(connection, chunk)
+        connection.execute(DROP_REPEATS)
+        connection.execute(INDEX)
+        stations = _station_types(connection.execute(
+            "SELECT DISTINCT sensor_id, event_type FROM readings WHERE event_type NOT LIKE '%CFT%'"))
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('signature', json.dumps(signature)), ('stations', json.dumps(stations))])
+        connection.commit()
+        # readers and the appending follower work side by side
+        connection.execute('PRAGMA journal_mode = WAL')
+    finally:
+        connection.close()
+    os.replace(tmp, path)
+
+
+class SqliteSlice:
+    # whole days first_day..last_day of one station, answered by range scans over the
+    # (sensor_id, event_type, event_date) index
+
+    def __init__(self, store, sensor_id, first_day, last_day):
+        self.store = store
+        self.sensor_id = sensor_id
+        start, end = day_bounds(first_day, last_day)
+        self.start, self.end = int(_seconds(start)), int(_seconds(end))
+
+    def _range(self, column):
+        return self.sensor_id, column, self.start, self.end
+
+    def _readings(self):
+        return DEDUPLICATED[self.store.duplicates]
+
+    def _column(self, column):
+        rows = self.store.query(f'SELECT event_date, sensor_value FROM ({self._readings()}) ORDER BY event_date',
+                                self._range(column))
+        rows = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return _times(rows[:, 0]), rows[:, 1].astype(np.float32)
+
+    def series(self, column, max_points=MAX_POINTS):
+        # the raw readings while they fit in max_points, otherwise max_points time buckets aggregated in sql
+        count, = self.store.query(f'SELECT count(DISTINCT event_date) FROM readings WHERE {RANGE}',
+                                  self._range(column))[0]
+        if max_points is None or count <= max_points:
+            return Series(*self._column(column))
+        width = -(-(self.end - self.start) // max_points)
+        rows = self.store.query(
+            'SELECT (event_date - ?) / ? AS bucket, avg(sensor_value), min(sensor_value), max(sensor_value) '
+            f'FROM ({self._readings()}) GROUP BY bucket ORDER BY bucket',
+            (self.start, width) + self._range(column))
+        rows = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        times = _times(self.start + rows[:, 0].astype(np.int64) * width)
+        return Series(times, *(rows[:, i].astype(np.float32) for i in (1, 2, 3)))
+
+    def wind_table(self):
+        # speed and direction readings of the range, paired by timestamp and binned like rosely
+        speed_times, speeds = self._column('WSP')
+        direction_times, directions = self._column('WDR')
+        _, i, j = np.intersect1d(speed_times, direction_times, assume_unique=True, return_indices=True)
+        return frequency_table(*wind_counts(speeds[i], directions[j]))
+
+
+class SqliteStore:
+    # the StationStore interface over an indexed sqlite file of the long-format readings: range filters,
+    # comfort score exclusion and time buckets run as sql, a callback only receives the rows or buckets it draws
+
+    def __init__(self, path, stations, version=None, duplicates=DUPLICATES):
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f'unknown duplicate policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}')
+        self.path = path
+        # sensor_id -> sensor types other than comfort scores
+        self.stations = stations
+        self.version = version
+        # the database keeps every reading, the policy is applied by the queries
+        self.duplicates = duplicates
+        self.source_size = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    @classmethod
+    def load(cls, path, chunk_rows=CHUNK_ROWS):
+        # reuse the database next to the csv while it matches the source file, rebuild it otherwise
+        signature = source_signature(path)
+        database = database_path(path)
+        meta = _read_meta(database)
+        # bytes of the source the database holds, appended readings start after them
+        size = complete_size(path, signature['size'])
+        if meta is None or meta.get('signature') != signature:
+            logger.info('building sqlite database for %s', path)
+            with startup_step('sqlite build'):
+                build_database(path, database, signature, chunk_rows, size)
+            meta = _read_meta(database)
+        store = cls(database, meta['stations'], signature_version(signature))
+        store.source_size = size
+        return store
+
+    @classmethod
+    def known_station_ids(cls, path):
+        meta = _read_meta(database_path(path))
+        if meta is None or meta.get('signature') != source_signature(path):
+            return None
+        return list(meta['stations'])
+
+    def query(self, sql, parameters=()):
+        # one connection per thread, sqlite connections are not shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+        return connection.execute(sql, parameters).fetchall()
+
+    def _memoized(self, key, build):
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = build()
+        with self._lock:
+            self._memo[key] = value
+        return value
+
+    def preload(self):
+        for sensor_id in self.station_ids():
+            self.time_range(sensor_id)
+        return self
+
+    def after_fork(self):
+        # a connection opened before a fork must not be used by the child, it opens its own on first query
+        self._local = threading.local()
+        return self
+
+    def station_ids(self):
+        return list(self.stations)
+
+    def columns(self, sensor_id):
+        return list(self.stations[sensor_id])
+
+    def time_range(self, sensor_id):
+        # min/max over each (sensor_id, event_type) index range are single index lookups
+        def build():
+            first = min(self.query('SELECT min(event_date) FROM readings WHERE sensor_id = ? AND event_type = ?',
+                                   (sensor_id, event_type))[0][0] for event_type in self.stations[sensor_id])
+            last = max(self.query('SELECT max(event_date) FROM readings WHERE sensor_id = ? AND event_type = ?',
+                                  (sensor_id, event_type))[0][0] for event_type in self.stations[sensor_id])
+            first, last = _times([first, last])
+            return first, last
+        return self._memoized(('time_range', sensor_id), build)
+
+    def readings_after(self, sensor_id, since=None):
+        # the rows newer than since (all of them for None) as a wide StationTable
+        after = -1 if since is None else int(_seconds(since))
+        parts = {}
+        for event_type in self.stations[sensor_id]:
+            rows = self.query('SELECT event_date, sensor_value FROM readings WHERE sensor_id = ? AND event_type = ? '
+                              'AND event_date > ? AND sensor_value IS NOT NULL ORDER BY event_date',
+                              (sensor_id, event_type, after))
+            rows = np.array(rows, dtype=np.float64).reshape(-1, 2)
+            parts[event_type] = [(_times(rows[:, 0]), rows[:, 1].astype(np.float32))]
+        return assemble_station(parts, self.duplicates)
+
+    def station(self, sensor_id):
+        # the whole station, only the clientside payload needs it
+        return self._memoized(('station', sensor_id), lambda: self.readings_after(sensor_id))
+
+    def wind_index(self, sensor_id):
+        return self._memoized(('wind_index', sensor_id), lambda: WindIndex.build(self.station(sensor_id)))
+
+    def slice(self, sensor_id, first_day, last_day):
+        return SqliteSlice(self, sensor_id, first_day, last_day)
+
+    def series(self, sensor_id, column, first_day, last_day, max_points=MAX_POINTS):
+        return self.slice(sensor_id, first_day, last_day).series(column, max_points)
+
+    def wind_table(self, sensor_id, first_day, last_day):
+        return self.slice(sensor_id, first_day, last_day).wind_table()
+
+    def append(self, readings):
+        # inserts long-format readings (as read_readings returns them), returns {sensor_id: first new timestamp}
+        if not len(readings):
+            return {}
+        stations = _station_types(zip(readings["sensor_id"].astype(str), readings["event_type"].astype(str)),
+                                  self.stations)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                _insert(connection, readings)
+                # appended rows are not in the csv, the next start rebuilds the database like the other backend
+                connection.executemany('UPDATE meta SET value = ? WHERE key = ?', [
+                    (json.dumps(stations), 'stations'), (json.dumps(None), 'signature')])
+        finally:
+            connection.close()
+        self.stations = stations
+        firsts = readings.groupby("sensor_id", observed=True)["event_date"].min()
+        changed = {str(sensor_id): firsts[sensor_id].to_datetime64() for sensor_id in firsts.index}
+        with self._lock:
+            self._memo.clear()
+        self.version = signature_version([self.version] + sorted(changed))
+        return changed
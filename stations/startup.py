@@ -0,0 +1,43 @@
+import contextlib
+import logging
+import os
+import sys
+import time
+
+# AA_STARTUP_PROFILE=1 times the initialization steps of a worker (app construction, page registration, data
+# load, csv read and reshape, first layout) and writes each one to stderr as it finishes;
+# benchmarks/startup.py adds the per-import times from python -X importtime
+STARTUP_PROFILE = os.environ.get('AA_STARTUP_PROFILE', '0') == '1'
+
+if STARTUP_PROFILE and not logging.getLogger().handlers:
+    # the progress of the csv read is logged at info, which nothing shows unless the app configured logging
+    _logger = logging.getLogger('stations')
+    if not _logger.handlers:
+        _handler = logging.StreamHandler(sys.stderr)
+        _handler.setFormatter(logging.Formatter('%(name)s: %(message)s'))
+        _logger.addHandler(_handler)
+        _logger.setLevel(logging.INFO)
+
+# (step, seconds) in the order the steps finished
+steps = []
+
+
+@contextlib.contextmanager
+def startup_step(name):
+    if not STARTUP_PROFILE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        steps.append((name, seconds))
+        print(f'startup: {name} {seconds:.4f}', file=sys.stderr, flush=True)
+
+
+def once(name):
+    # startup_step for code that runs again later (layouts on every visit): only the first run is a startup step
+    if any(step == name for step, _ in steps):
+        return contextlib.nullcontext()
+    return startup_step(name)
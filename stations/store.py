@@ -0,0 +1,335 @@
+import logging
+import os
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .cache import CACHE_ENABLED, cache_path, load_cache, save_cache, signature_version, source_signature
+from .pyramid import Pyramid
+from .downsample import MAX_POINTS
+from .readings import (CHUNK_ROWS, DUPLICATES, GRID, complete_size, open_source, read_readings, read_station_tables,
+                       reshape_station)
+from .sqlstore import SqliteStore
+from .startup import startup_step
+from .table import StationTable, day_bounds
+from .wind import WindIndex, wind_rose_table
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = os.environ.get('AA_DATA_FILE', 'adaptive_artifacts_data_septend.csv')
+# load every station at startup instead of on the first visit of each station page
+PRELOAD = os.environ.get('AA_PRELOAD', '0') == '1'
+# the WindIndex attributes kept in the data cache, in the order its constructor takes them
+WIND_ARRAYS = ('days', 'counts', 'edges', 'low', 'high')
+
+
+class LazyMapping(Mapping):
+    # builds each value on first access, once, so a worker only pays for the stations it serves
+
+    def __init__(self, keys, build):
+        self._keys = list(keys)
+        self._build = build
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._build(key)
+            return self._values[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self._keys:
+                self._keys.append(key)
+            self._values[key] = value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class StationSlice:
+    # whole days first_day..last_day of one station, parsed and sliced once and shared by every figure drawn
+    # from them; the series and the wind rose are only computed when asked for
+
+    def __init__(self, table, pyramid, wind_index, first_day, last_day):
+        self.table = table
+        self.pyramid = pyramid
+        self.wind_index = wind_index
+        self.start, self.end = day_bounds(first_day, last_day)
+        self.selection = table.between(self.start, self.end)
+
+    def series(self, column, max_points=MAX_POINTS):
+        return self.pyramid.series_between(self.selection, column, self.start, self.end, max_points)
+
+    def wind_table(self):
+        return wind_rose_table(self.table, self.wind_index, self.start, self.end, self.selection)
+
+
+class StationStore:
+    # one time-sorted StationTable per weather station, keyed by sensor_id, with its rollup Pyramid
+    # and per-day WindIndex (None for stations without wind sensors)
+
+    def __init__(self, stations, pyramids=None, wind_indexes=None, version=None):
+        self.stations = stations
+        # identifies the source data, results shared between processes are keyed by it
+        self.version = version
+        if pyramids is None:
+            pyramids = {sensor_id: Pyramid.build(table) for sensor_id, table in stations.items()}
+        if wind_indexes is None:
+            wind_indexes = {sensor_id: WindIndex.build(table) for sensor_id, table in stations.items()}
+        self.pyramids = pyramids
+        self.wind_indexes = wind_indexes
+        self.source_size = None
+
+    @classmethod
+    def load(cls, path=DATA_FILE, use_cache=CACHE_ENABLED):
+        # use the binary cache next to the csv while it matches the source file, rebuild it otherwise
+        signature = cls.signature(path)
+        version = signature_version(signature)
+        with startup_step('cache open'):
+            cached = load_cache(cache_path(path), signature) if use_cache else None
+        # bytes of the source the store is read from, appended readings start after them
+        size = complete_size(path, signature['size'])
+        if cached is not None:
+            store = cls.from_arrays(*cached)
+        else:
+            store = cls.from_csv(path, size=size)
+        store.version = version
+        store.source_size = size
+        if use_cache and cached is None:
+            logger.info('building data cache for %s', path)
+            with startup_step('cache write'):
+                meta, arrays = store.to_arrays()
+                save_cache(cache_path(path), signature, arrays, meta)
+        return store
+
+    @classmethod
+    def from_csv(cls, path=DATA_FILE, chunk_rows=CHUNK_ROWS, size=None):
+        if chunk_rows:
+            return cls(read_station_tables(path, chunk_rows, size=size))
+        with startup_step('csv read'), open_source(path, size) as source:
+            readings = read_readings(source)
+        # separate each weather station into a different table, the long table is dropped afterwards
+        with startup_step('reshape'):
+            stations = {str(sensor_id): reshape_station(group)
+                        for sensor_id, group in readings.groupby("sensor_id", sort=True, observed=True)}
+        return cls(stations)
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        # tables are only read from the arrays when a station is first used
+        def station(sensor_id):
+            return _table_from_arrays(arrays, sensor_id, meta['stations'][sensor_id])
+
+        def pyramid(sensor_id):
+            return Pyramid({
+                level: _table_from_arrays(arrays, f'{sensor_id}/pyramid/{level}', level_columns)
+                for level, level_columns in meta['pyramids'][sensor_id].items()
+            })
+
+        def wind_index(sensor_id):
+            if sensor_id not in meta['wind']:
+                return None
+            return WindIndex(*(arrays[f'{sensor_id}/wind/{name}'] for name in WIND_ARRAYS))
+
+        sensor_ids = list(meta['stations'])
+        return cls(LazyMapping(sensor_ids, station), LazyMapping(sensor_ids, pyramid),
+                   LazyMapping(sensor_ids, wind_index))
+
+    def append(self, readings):
+        # adds long-format readings (as read_readings returns them): only the new rows are reshaped, the rollups
+        # and wind index are redone from the first new day on; returns {sensor_id: first new timestamp}
+        changed = {}
+        for sensor_id, group in readings.groupby("sensor_id", sort=True, observed=True):
+            sensor_id = str(sensor_id)
+            added = reshape_station(group)
+            if not len(added):
+                continue
+            since = added.times[0]
+            if sensor_id in self.stations:
+                table = self.stations[sensor_id].append(added, DUPLICATES)
+                pyramid = self.pyramids[sensor_id].extend(table, since)
+                wind_index = self.wind_indexes[sensor_id]
+                wind_index = WindIndex.build(table) if wind_index is None else wind_index.extend(table, since)
+            else:
+                table, pyramid, wind_index = added, Pyramid.build(added), WindIndex.build(added)
+            self.stations[sensor_id] = table
+            self.pyramids[sensor_id] = pyramid
+            self.wind_indexes[sensor_id] = wind_index
+            changed[sensor_id] = since
+        if changed:
+            state = [self.version] + [f'{sensor_id}:{len(self.stations[sensor_id])}' for sensor_id in changed]
+            self.version = signature_version(state)
+        return changed
+
+    def to_arrays(self):
+        # flatten every station table into plain typed columns
+        meta = {'stations': {}, 'pyramids': {}, 'wind': []}
+        arrays = {}
+        for sensor_id, table in self.stations.items():
+            meta['stations'][sensor_id] = _table_to_arrays(arrays, sensor_id, table)
+            meta['pyramids'][sensor_id] = {
+                level: _table_to_arrays(arrays, f'{sensor_id}/pyramid/{level}', level_table)
+                for level, level_table in self.pyramids[sensor_id].levels.items()
+            }
+            wind_index = self.wind_indexes[sensor_id]
+            if wind_index is not None:
+                meta['wind'].append(sensor_id)
+                for name in WIND_ARRAYS:
+                    arrays[f'{sensor_id}/wind/{name}'] = getattr(wind_index, name)
+        return meta, arrays
+
+    @staticmethod
+    def signature(path):
+        # tables reshaped under another duplicate policy or grid are not reused
+        return dict(source_signature(path), reshape=[DUPLICATES, GRID])
+
+    @classmethod
+    def known_station_ids(cls, path=DATA_FILE):
+        # the station ids from the cache metadata while it is current, None otherwise
+        cached = load_cache(cache_path(path), cls.signature(path)) if CACHE_ENABLED else None
+        return None if cached is None else list(cached[0]['stations'])
+
+    def station_ids(self):
+        return list(self.stations)
+
+    def columns(self, sensor_id):
+        # the sensor types a station reported
+        return list(self.stations[sensor_id].columns)
+
+    def time_range(self, sensor_id):
+        # first and last reading of a station
+        times = self.stations[sensor_id].times
+        return times[0], times[-1]
+
+    def readings_after(self, sensor_id, since):
+        # the rows newer than since
+        table = self.stations[sensor_id]
+        return table.take(int(np.searchsorted(table.times, since, side='right')), len(table))
+
+    def station(self, sensor_id):
+        return self.stations[sensor_id]
+
+    def pyramid(self, sensor_id):
+        return self.pyramids[sensor_id]
+
+    def wind_index(self, sensor_id):
+        return self.wind_indexes[sensor_id]
+
+    def preload(self):
+        # reads every station, pyramid and wind index up front
+        for sensor_id in self.station_ids():
+            self.station(sensor_id)
+            self.pyramid(sensor_id)
+            self.wind_index(sensor_id)
+        return self
+
+    def after_fork(self):
+        # the arrays are read-only (memory-mapped from the cache, or the master's copy-on-write pages), nothing
+        # is tied to the parent process
+        return self
+
+    def slice(self, sensor_id, first_day, last_day):
+        return StationSlice(self.stations[sensor_id], self.pyramids[sensor_id], self.wind_indexes[sensor_id],
+                            first_day, last_day)
+
+    def series(self, sensor_id, column, first_day, last_day, max_points=MAX_POINTS):
+        # what a station line chart draws for whole days first_day..last_day
+        return self.slice(sensor_id, first_day, last_day).series(column, max_points)
+
+    def wind_table(self, sensor_id, first_day, last_day):
+        return self.slice(sensor_id, first_day, last_day).wind_table()
+
+
+def _table_to_arrays(arrays, prefix, table):
+    arrays[f'{prefix}/event_date'] = table.times
+    for column, values in table.columns.items():
+        arrays[f'{prefix}/{column}'] = values
+    return list(table.columns)
+
+
+def _table_from_arrays(arrays, prefix, columns):
+    return StationTable(arrays[f'{prefix}/event_date'], {column: arrays[f'{prefix}/{column}'] for column in columns})
+
+
+def discover_stations(path=DATA_FILE):
+    # the station ids without loading any data: from what the backend keeps next to the csv while it is
+    # current, otherwise from the sensor_id column alone
+    sensor_ids = BACKENDS[BACKEND].known_station_ids(path)
+    if sensor_ids is not None:
+        return sensor_ids
+    sensor_ids = pd.read_csv(path, usecols=['sensor_id'], dtype={'sensor_id': 'category'})['sensor_id']
+    return sorted(str(sensor_id) for sensor_id in sensor_ids.cat.categories)
+
+
+# where the readings are held and queried: 'memory' (numpy tables, rollups and wind index) or 'sqlite'
+# (an indexed database next to the csv, filters and time buckets run as sql)
+BACKENDS = {'memory': StationStore, 'sqlite': SqliteStore}
+BACKEND = os.environ.get('AA_BACKEND', 'memory')
+
+
+_store = None
+_store_lock = threading.Lock()
+_reload_listeners = []
+_append_listeners = []
+
+
+def get_store():
+    # the file is loaded once per process on first use, every page shares the same tables
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                with startup_step('data load'):
+                    _store = BACKENDS[BACKEND].load(DATA_FILE)
+    return _store
+
+
+def loaded_store():
+    # the store if it was already loaded, without loading it
+    return _store
+
+
+def preload():
+    # warm-up hook: load the data and every station before the first request instead of during it
+    return get_store().preload()
+
+
+def on_reload(listener):
+    # listener() runs whenever reload_store() swaps in new data, e.g. to drop cached figures
+    _reload_listeners.append(listener)
+    return listener
+
+
+def on_append(listener):
+    # listener(sensor_id, since) runs for every station append_readings() added readings to
+    _append_listeners.append(listener)
+    return listener
+
+
+def reload_store():
+    global _store
+    store = BACKENDS[BACKEND].load(DATA_FILE)
+    with _store_lock:
+        _store = store
+    for listener in _reload_listeners:
+        listener()
+    return _store
+
+
+def append_readings(readings):
+    changed = get_store().append(readings)
+    for sensor_id, since in changed.items():
+        for listener in _append_listeners:
+            listener(sensor_id, since)
+    return changed
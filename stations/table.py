@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+
+def to_datetime64(value):
+    # accepts the date strings sent by the date pickers as well as datetimes and timestamps
+    return pd.Timestamp(value).to_datetime64()
+
+
+def day_bounds(first_day, last_day):
+    # date pickers select whole days, so the last selected day is included up to midnight
+    return to_datetime64(first_day), to_datetime64(last_day) + ONE_DAY
+
+
+class StationTable:
+    # one weather station as a sorted timestamp array plus one value array per sensor type,
+    # range queries are two binary searches and return views that share the underlying arrays
+
+    def __init__(self, times, columns):
+        self.times = times
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, frame, time_column="event_date"):
+        frame = frame.sort_values(time_column, kind="stable")
+        times = frame[time_column].to_numpy()
+        columns = {str(column): frame[column].to_numpy() for column in frame.columns if column != time_column}
+        return cls(times, columns)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def present(self, column):
+        # rows holding a reading of column, a sensor without one at that time is NaN
+        return ~np.isnan(self.columns[column])
+
+    def first_date(self):
+        return pd.Timestamp(self.times[0]).date()
+
+    def last_date(self):
+        return pd.Timestamp(self.times[-1]).date()
+
+    def index_range(self, start, end):
+        # positions of the rows with start <= event_date < end
+        i = int(np.searchsorted(self.times, to_datetime64(start), side='left'))
+        j = int(np.searchsorted(self.times, to_datetime64(end), side='left'))
+        return i, max(i, j)
+
+    def take(self, i, j):
+        return StationTable(self.times[i:j], {column: values[i:j] for column, values in self.columns.items()})
+
+    def append(self, other, duplicates='mean'):
+        # a new table with the rows of other added, columns missing on either side are NaN; only the rows from
+        # other's first timestamp on are touched. A reading sharing a timestamp with a loaded one is merged by the
+        # duplicate policy of the readings ('mean', 'first' or 'last', the loaded rows come first in file order);
+        # a loaded cell counts as one reading, the readings it was averaged from are gone
+        if not len(other):
+            return self
+        i = int(np.searchsorted(self.times, other.times[0], side='left'))
+        head, overlap = self.take(0, i), self.take(i, len(self))
+        tail = other
+        if len(overlap):
+            merged = pd.concat([overlap.to_frame(), other.to_frame()]).groupby(level=0, sort=True).agg(duplicates)
+            dtypes = {**{column: values.dtype for column, values in other.columns.items()},
+                      **{column: values.dtype for column, values in self.columns.items()}}
+            tail = StationTable(merged.index.to_numpy(), {column: merged[column].to_numpy(dtype=dtypes[column])
+                                                          for column in merged.columns})
+        names = list(self.columns) + [column for column in tail.columns if column not in self.columns]
+        columns = {column: np.concatenate([head._column(column, tail), tail._column(column, head)])
+                   for column in names}
+        return StationTable(np.concatenate([head.times, tail.times]), columns)
+
+    def _column(self, column, like):
+        if column in self.columns:
+            return self.columns[column]
+        return np.full(len(self), np.nan, dtype=like.columns[column].dtype)
+
+    def between(self, start, end):
+        return self.take(*self.index_range(start, end))
+
+    def between_dates(self, first_day, last_day):
+        return self.between(*day_bounds(first_day, last_day))
+
+    def to_frame(self, time_column="event_date"):
+        return pd.DataFrame(self.columns, index=pd.Index(self.times, name=time_column))
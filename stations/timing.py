@@ -0,0 +1,79 @@
+import contextlib
+import contextvars
+import functools
+import time
+from collections import defaultdict
+
+from dash import ctx
+
+# stages of a callback: filter (range lookup), aggregate (series / wind rose), build (figure objects),
+# serialize (everything dash does after the callback returns, mostly json encoding), total (the request)
+STAGES = ('filter', 'aggregate', 'build', 'serialize', 'total')
+
+_timing = contextvars.ContextVar('station_timing', default=None)
+
+
+def current_timing():
+    return _timing.get()
+
+
+def set_timing(timing):
+    # the RequestTiming of the request this thread serves, None when it is not sampled
+    _timing.set(timing)
+
+
+class RequestTiming:
+    # stage durations of one sampled callback request
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.labels = {'callback': 'unknown', 'station': '', 'trigger': ''}
+        self.body = 0.0
+
+
+@contextlib.contextmanager
+def stage(name):
+    # adds the time spent in the block to stage name of the current request, a no-op when it is not sampled
+    timing = _timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.stages[name] += time.perf_counter() - start
+
+
+def _trigger(triggered_id):
+    # 'initial' for the first draw, otherwise the picker type (and graph) that fired
+    if triggered_id is None:
+        return 'initial'
+    if isinstance(triggered_id, dict):
+        return ':'.join(str(triggered_id[key]) for key in ('type', 'metric') if key in triggered_id)
+    return str(triggered_id)
+
+
+def timed_callback(function):
+    # wraps a dash callback body: names the request after it and times it, dash's own work is what is left
+    # of the request afterwards
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timing = _timing.get()
+        if timing is None:
+            return function(*args, **kwargs)
+        timing.labels['callback'] = function.__name__
+        outputs = ctx.outputs_list
+        for output in outputs if isinstance(outputs, list) else [outputs]:
+            output = output[0] if isinstance(output, list) and output else output
+            if isinstance(output, dict) and isinstance(output.get('id'), dict):
+                timing.labels['station'] = output['id'].get('station', '')
+                break
+        timing.labels['trigger'] = _trigger(ctx.triggered_id)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timing.body += time.perf_counter() - start
+    return wrapper
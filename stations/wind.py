@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .table import to_datetime64
+
+# 16 point compass, sector 0 (N) is centred on 0°
+SECTOR_LABELS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+                 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+SPEED_BINS = 9
+MIN_SPEED = 0.05  # remove outliers / negatives
+
+
+def sector_index(wd):
+    # same binning as rosely: 11.25° half sectors closed on the right over (0, 360], neighbouring halves
+    # share a label so sector s is (22.5s - 11.25, 22.5s + 11.25], -1 marks directions rosely drops
+    wd = np.asarray(wd, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        sector = np.ceil((wd - 11.25) / 22.5).astype(np.int64) % 16
+    sector[~((wd > 0) & (wd <= 360))] = -1
+    return sector
+
+
+def speed_edges(ws, bins=SPEED_BINS):
+    # equal width bins like pandas.cut, the lowest edge is moved down by 0.1% so the minimum is included
+    low, high = float(np.min(ws)), float(np.max(ws))
+    if low == high:
+        pad = 0.001 * abs(low) if low else 0.001
+        return np.linspace(low - pad, high + pad, bins + 1)
+    edges = np.linspace(low, high, bins + 1)
+    edges[0] -= (high - low) * 0.001
+    return edges
+
+
+def speed_index(ws, edges):
+    # (a, b] bins, -1 outside the edges
+    index = np.digitize(ws, edges, right=True) - 1
+    index[index >= len(edges) - 1] = -1
+    return index
+
+
+def clean_wind(ws, wd):
+    # readings with both values and a speed of at least MIN_SPEED
+    ws = np.asarray(ws, dtype=np.float64)
+    wd = np.asarray(wd, dtype=np.float64)
+    keep = ~np.isnan(ws) & ~np.isnan(wd) & (ws >= MIN_SPEED)
+    return ws[keep], wd[keep], keep
+
+
+def bin_wind(ws, wd, edges):
+    # flat sector * bins + speed bin of every reading, -1 for readings outside the sectors or edges
+    sector = sector_index(wd)
+    speed = speed_index(ws, edges)
+    flat = sector * (len(edges) - 1) + speed
+    flat[(sector < 0) | (speed < 0)] = -1
+    return flat
+
+
+def wind_counts(ws, wd, bins=SPEED_BINS, edges=None):
+    # the rosely calc_stats binning as two digitize passes and one bincount, returns (16 x bins counts, edges)
+    ws, wd, _ = clean_wind(ws, wd)
+    if edges is None:
+        # like rosely the speed bins span every clean reading of the selection
+        edges = speed_edges(ws, bins) if len(ws) else np.linspace(0.0, 1.0, bins + 1)
+    flat = bin_wind(ws, wd, edges)
+    counts = np.bincount(flat[flat >= 0], minlength=16 * (len(edges) - 1))
+    return counts.reshape(16, len(edges) - 1), edges
+
+
+def _label_edge(edge, precision=3):
+    # pandas.cut rounds the interval edges it displays and rosely formats those, so labels match rosely's
+    frac, whole = math.modf(edge)
+    if not frac:
+        return edge
+    digits = precision if whole else -int(math.floor(math.log10(abs(frac)))) - 1 + precision
+    return round(edge, digits)
+
+
+def frequency_table(counts, edges):
+    # 16 x bins count matrix -> the frequency/direction/speed rows px.bar_polar draws, percentages like rosely
+    total = counts.sum()
+    frequency = (counts.T * (100.0 / total) if total else counts.T * 0.0).round(2)
+    edges = [_label_edge(float(edge)) for edge in edges]
+    labels = ['{:.2f}-{:.2f}'.format(low, high) for low, high in zip(edges[:-1], edges[1:])]
+    return pd.DataFrame({
+        'direction': np.tile(SECTOR_LABELS, len(labels)),
+        'speed': np.repeat(labels, len(SECTOR_LABELS)),
+        'frequency': frequency.ravel(),
+    })
+
+
+class WindIndex:
+    # per-day direction sector x speed bin counts, a date range is a sum over a slice of days; the lowest and
+    # highest clean speed of every day (NaN without one) tell an extension whether the speed bins moved
+
+    def __init__(self, days, counts, edges, low, high):
+        self.days = days
+        self.counts = counts
+        self.edges = edges
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def build(cls, table, bins=SPEED_BINS, edges=None):
+        if 'WSP' not in table or 'WDR' not in table:
+            return None
+        ws, wd, keep = clean_wind(table['WSP'], table['WDR'])
+        if not len(ws):
+            return None
+        # speed bins are fixed per station so every range shares one legend
+        if edges is None:
+            edges = speed_edges(ws, bins)
+        bins = len(edges) - 1
+        flat = bin_wind(ws, wd, edges)
+        day = table.times[keep].astype('datetime64[D]')
+        days = np.arange(day[0], day[-1] + np.timedelta64(1, 'D'))
+        position = (day - days[0]).astype(np.int64)
+        flat = np.where(flat >= 0, position * 16 * bins + flat, -1)
+        counts = np.bincount(flat[flat >= 0], minlength=len(days) * 16 * bins).reshape(len(days), 16, bins)
+        # the readings are in time order, each day is one run of them
+        starts = np.flatnonzero(np.diff(position, prepend=-1))
+        low = np.full(len(days), np.nan)
+        high = np.full(len(days), np.nan)
+        low[position[starts]] = np.minimum.reduceat(ws, starts)
+        high[position[starts]] = np.maximum.reduceat(ws, starts)
+        return cls(days, counts.astype(np.int32), edges, low, high)
+
+    def extend(self, table, since):
+        # table already holds the new readings from since on, the days from since's day onwards are counted again
+        day = to_datetime64(since).astype('datetime64[D]')
+        tail = table.take(int(np.searchsorted(table.times, day, side='left')), len(table))
+        if 'WSP' not in tail or 'WDR' not in tail:
+            return self
+        i = int(np.searchsorted(self.days, day, side='left'))
+        # the speed bins span every reading of the station, a new extreme moves all of them: the edges of the kept
+        # days' extremes and the new speeds are those of a full build, without going over the older readings
+        ws, _, _ = clean_wind(tail['WSP'], tail['WDR'])
+        extremes = np.concatenate([self.low[:i], self.high[:i], ws])
+        extremes = extremes[~np.isnan(extremes)]
+        if not len(extremes):
+            return None
+        if not np.array_equal(speed_edges(extremes, len(self.edges) - 1), self.edges):
+            return WindIndex.build(table, len(self.edges) - 1)
+        added = WindIndex.build(tail, edges=self.edges)
+        if added is None:
+            return WindIndex(self.days[:i], self.counts[:i], self.edges, self.low[:i], self.high[:i])
+        # days without readings between the kept ones and the new ones are counted as empty, like a full build does
+        gap = np.arange(self.days[i - 1] + np.timedelta64(1, 'D'), added.days[0]) if i else self.days[:0]
+        empty = np.zeros((len(gap),) + self.counts.shape[1:], dtype=self.counts.dtype)
+        missing = np.full(len(gap), np.nan)
+        return WindIndex(np.concatenate([self.days[:i], gap, added.days]),
+                         np.concatenate([self.counts[:i], empty, added.counts]), self.edges,
+                         np.concatenate([self.low[:i], missing, added.low]),
+                         np.concatenate([self.high[:i], missing, added.high]))
+
+    def serves(self, start, end):
+        # only whole days can be answered from the index
+        start, end = to_datetime64(start), to_datetime64(end)
+        return start == start.astype('datetime64[D]') and end == end.astype('datetime64[D]')
+
+    def counts_between(self, start, end):
+        start = to_datetime64(start).astype('datetime64[D]')
+        end = to_datetime64(end).astype('datetime64[D]')
+        i, j = np.searchsorted(self.days, [start, end], side='left')
+        return self.counts[i:j].sum(axis=0, dtype=np.int64)
+
+    def table(self, start, end):
+        return frequency_table(self.counts_between(start, end), self.edges)
+
+
+def wind_rose_table(table, index, start, end, selection=None):
+    # whole days come from the per-day index, anything else is binned from the raw readings
+    if index is not None and index.serves(start, end):
+        return index.table(start, end)
+    if selection is None:
+        selection = table.between(start, end)
+    return frequency_table(*wind_counts(selection['WSP'], selection['WDR']))
@@ -0,0 +1,31 @@
+import gc
+import importlib
+
+from .ingest import LIVE, start_follower, stop_follower
+from .store import loaded_store
+
+# imported by the first figure a process draws (deferred to keep a single worker's boot short), a master that
+# forks workers imports them once for all of them
+FIGURE_MODULES = ('plotly.graph_objects', 'plotly.express')
+
+# hooks of gunicorn.conf.py: with preload_app the master imports the app and loads every station (AA_PRELOAD)
+# once, the workers forked from it share those pages copy-on-write and only pay for what they allocate themselves
+
+
+def before_fork():
+    for module in FIGURE_MODULES:
+        importlib.import_module(module)
+    # threads do not survive a fork and one holding a lock while it happens leaves the lock held in the child,
+    # the workers run their own follower
+    stop_follower()
+    # moves everything the master allocated to the permanent generation: collections in a worker no longer write
+    # to those objects' headers, which would copy every page they touch
+    gc.freeze()
+
+
+def after_fork():
+    store = loaded_store()
+    if store is not None:
+        store.after_fork()
+    if LIVE:
+        start_follower()
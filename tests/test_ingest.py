@@ -0,0 +1,45 @@
+from stations.ingest import DropDirectory, TailReader
+from stations.readings import complete_size, read_station_tables
+
+HEADER = 'event_date,sensor_id,sensor_value,event_type\n'
+
+
+def test_load_and_tail_split_a_half_written_line(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_text(HEADER + '2022-04-01 00:00:00,WeatherStation1,11,TMP\n'
+                             '2022-04-01 00:10:00,WeatherStation1,12,TMP\n'
+                             '2022-04-01 00:20:00,Weather')
+    size = complete_size(str(path), path.stat().st_size, follow=True)
+    assert read_station_tables(str(path), chunk_rows=1, size=size)['WeatherStation1']['TMP'].tolist() == [11.0, 12.0]
+    tail = TailReader(str(path), size)
+    assert tail.read() is None
+    with open(path, 'a') as f:
+        f.write('Station1,13.5,TMP\n')
+    readings = tail.read()
+    tail.commit()
+    assert readings['sensor_value'].tolist() == [13.5]
+    assert tail.read() is None
+
+
+def test_tail_skips_lines_that_do_not_parse(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_text(HEADER)
+    tail = TailReader(str(path), path.stat().st_size)
+    with open(path, 'a') as f:
+        f.write('2022-04-01 00:00:00,WeatherStation1,11,TMP\n'
+                '3.5,TMP\n'
+                '2022-04-01 00:10:00,WeatherStation1,12,TMP\n')
+    readings = tail.read()
+    tail.commit()
+    assert readings['sensor_value'].tolist() == [11.0, 12.0]
+    assert str(readings['sensor_id'].dtype) == 'category'
+    assert tail.offset == path.stat().st_size
+
+
+def test_drop_directory_skips_files_that_do_not_parse(tmp_path):
+    (tmp_path / 'bad.csv').write_text(HEADER + 'not a date,WeatherStation1,x,TMP\n')
+    (tmp_path / 'good.csv').write_text(HEADER + '2022-04-01 00:00:00,WeatherStation1,11,TMP\n')
+    drop = DropDirectory(str(tmp_path))
+    assert len(drop.read()) == 1
+    drop.commit()
+    assert drop.read() == []
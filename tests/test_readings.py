@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stations.readings import READING_DTYPES, read_station_tables, reshape_station
+
+
+def readings(rows):
+    # long-format readings typed like read_readings returns them, from (time, sensor_id, value, type) rows
+    frame = pd.DataFrame(rows, columns=['event_date', 'sensor_id', 'sensor_value', 'event_type'])
+    frame = frame.astype({column: dtype for column, dtype in READING_DTYPES.items() if column != 'event_date'})
+    frame['event_date'] = pd.to_datetime(frame['event_date'])
+    return frame
+
+
+def test_reshape_station_drops_readings_without_type():
+    table = reshape_station(readings([
+        ('2022-04-01 00:00', 'WeatherStation1', 11.0, 'TMP'),
+        ('2022-04-01 00:00', 'WeatherStation1', 99.0, None),
+        ('2022-04-01 00:10', 'WeatherStation1', 12.0, 'TMP'),
+    ]))
+    assert list(table.columns) == ['TMP']
+    assert table['TMP'].tolist() == [11.0, 12.0]
+
+
+@pytest.mark.parametrize('duplicates, expected', [('mean', [12.0, 20.0]), ('first', [10.0, 20.0]),
+                                                  ('last', [14.0, 20.0])])
+def test_reshape_station_duplicates(duplicates, expected):
+    table = reshape_station(readings([
+        ('2022-04-01 00:00', 'WeatherStation1', 10.0, 'TMP'),
+        ('2022-04-01 00:10', 'WeatherStation1', 20.0, 'TMP'),
+        ('2022-04-01 00:00', 'WeatherStation1', 14.0, 'TMP'),
+        ('2022-04-01 00:00', 'WeatherStation1', 50.0, 'HMD'),
+    ]), duplicates)
+    assert np.array_equal(table.times, pd.to_datetime(['2022-04-01 00:00', '2022-04-01 00:10']).to_numpy())
+    assert table['TMP'].tolist() == expected
+    assert np.isnan(table['HMD'][1])
+
+
+def test_chunked_read_drops_blank_station_and_type(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_text('event_date,sensor_id,sensor_value,event_type\n'
+                    '2022-04-01 00:00:00,WeatherStation1,11,TMP\n'
+                    '2022-04-01 00:00:00,WeatherStation2,22,TMP\n'
+                    '2022-04-01 00:00:00,WeatherStation2,99,\n'
+                    '2022-04-01 00:00:00,,77,TMP\n'
+                    '2022-04-01 00:10:00,WeatherStation2,23,HMD\n')
+    tables = read_station_tables(str(path), chunk_rows=2)
+    assert sorted(tables) == ['WeatherStation1', 'WeatherStation2']
+    assert tables['WeatherStation1']['TMP'].tolist() == [11.0]
+    assert tables['WeatherStation2']['TMP'][0] == 22.0
+    assert tables['WeatherStation2']['HMD'][1] == 23.0
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stations.readings import reshape_station
+from tests.test_readings import readings
+
+FIRST = [('2022-04-01 00:00', 'WeatherStation1', 10.0, 'TMP'),
+         ('2022-04-01 00:10', 'WeatherStation1', 20.0, 'TMP'),
+         ('2022-04-01 00:10', 'WeatherStation1', 60.0, 'HMD')]
+# resends the reading at 00:10 with another value
+SECOND = [('2022-04-01 00:10', 'WeatherStation1', 30.0, 'TMP'),
+          ('2022-04-01 00:20', 'WeatherStation1', 40.0, 'TMP'),
+          ('2022-04-01 00:20', 'WeatherStation1', 1.5, 'WSP')]
+
+
+@pytest.mark.parametrize('duplicates', ['mean', 'first', 'last'])
+def test_append_matches_reshaping_every_reading(duplicates):
+    table = reshape_station(readings(FIRST), duplicates).append(reshape_station(readings(SECOND), duplicates),
+                                                                 duplicates)
+    expected = reshape_station(readings(FIRST + SECOND), duplicates)
+    assert np.array_equal(table.times, expected.times)
+    assert sorted(table.columns) == sorted(expected.columns)
+    for column in expected.columns:
+        assert table[column].dtype == expected[column].dtype
+        assert np.array_equal(table[column], expected[column], equal_nan=True), column
+
+
+def test_append_without_overlap_adds_the_rows():
+    table = reshape_station(readings(FIRST[:1])).append(reshape_station(readings(SECOND)))
+    assert np.array_equal(table.times, pd.to_datetime(['2022-04-01 00:00', '2022-04-01 00:10',
+                                                       '2022-04-01 00:20']).to_numpy())
+    assert table['TMP'].tolist() == [10.0, 30.0, 40.0]
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stations.readings import reshape_station
+from stations.wind import WindIndex
+
+
+def station(times, speeds, directions):
+    # a wide StationTable of wind readings
+    times = pd.to_datetime(times)
+    frame = pd.DataFrame({
+        'event_date': np.concatenate([times, times]),
+        'sensor_id': 'WeatherStation1',
+        'sensor_value': np.concatenate([speeds, directions]).astype(np.float32),
+        'event_type': ['WSP'] * len(times) + ['WDR'] * len(times),
+    })
+    frame[['sensor_id', 'event_type']] = frame[['sensor_id', 'event_type']].astype('category')
+    return reshape_station(frame)
+
+
+def assert_same(index, expected):
+    assert np.array_equal(index.days, expected.days)
+    assert np.array_equal(index.counts, expected.counts)
+    assert np.array_equal(index.edges, expected.edges)
+    assert np.array_equal(index.low, expected.low, equal_nan=True)
+    assert np.array_equal(index.high, expected.high, equal_nan=True)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_extend_matches_a_full_build(seed):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2022-04-01', periods=3000, freq='10min')
+    speeds = rng.gamma(2.0, 2.0, len(times))
+    directions = rng.uniform(0, 360, len(times))
+    split = int(rng.integers(100, len(times) - 100))
+    # appended readings may reach outside the speeds seen so far, including between the padded lowest edge and
+    # the old minimum
+    low = speeds[:split].min()
+    outliers = rng.random(len(times) - split) < 0.01
+    speeds[split:] = np.where(outliers, low - (0.0005 if seed % 2 else 1.0), speeds[split:])
+    before = station(times[:split], speeds[:split], directions[:split])
+    full = station(times, speeds, directions)
+    extended = WindIndex.build(before).extend(full, times[split].to_datetime64())
+    assert_same(extended, WindIndex.build(full))
+
+
+def test_extend_after_a_gap_of_days():
+    times = pd.date_range('2022-04-01', periods=200, freq='1h').append(
+        pd.date_range('2022-04-20', periods=50, freq='1h'))
+    # within the speeds seen before the gap, so the index is extended rather than rebuilt
+    speeds = np.tile(np.linspace(1.0, 10.0, 10), 25)
+    directions = np.full(len(times), 90.0)
+    before = station(times[:200], speeds[:200], directions[:200])
+    full = station(times, speeds, directions)
+    assert_same(WindIndex.build(before).extend(full, times[200].to_datetime64()), WindIndex.build(full))
+
+
+def test_extend_after_a_resent_reading_raised_the_minimum():
+    times = pd.date_range('2022-04-01', periods=300, freq='h')
+    speeds = np.linspace(1.0, 10.0, len(times))
+    before = station(times, speeds, np.full(len(times), 90.0))
+    # the slowest reading is sent again faster, averaged with the loaded one the station's minimum goes up
+    resent = station(times[:1], [5.0], [90.0])
+    table = before.append(resent, 'mean')
+    assert_same(WindIndex.build(before).extend(table, times[0]), WindIndex.build(table))